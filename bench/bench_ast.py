@@ -0,0 +1,56 @@
+import argparse
+import gc
+import io
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+
+from bench.bench_lexer import generate_src
+from tnl.code_printer import CodePrinter
+from tnl.lexer import Lexer
+from tnl.parser import Parser
+from tnl.semantic_analyzer import analyze
+
+
+# Measures the memory held by the tokens and AST of a generated program,
+# and the time spent parsing, analyzing and walking it.
+#
+#   python -m bench.bench_ast --lines 100000
+
+def main() -> None:
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument('--lines', type=int, default=100_000)
+    args = argparser.parse_args()
+
+    src = generate_src(args.lines)
+
+    gc.collect()
+    tracemalloc.start()
+    tokens = Lexer(src, 'bench').lex()
+    tokens_bytes, _ = tracemalloc.get_traced_memory()
+    start = time.perf_counter()
+    ast = Parser(tokens, 'bench').parse()
+    parse_seconds = time.perf_counter() - start
+    total_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    errors = analyze(ast)
+    analyze_seconds = time.perf_counter() - start
+    assert not errors, errors[:3]
+
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        CodePrinter(4).visit(ast)
+    print_seconds = time.perf_counter() - start
+
+    print(f'{args.lines} lines, {len(tokens)} tokens:')
+    print(f'  tokens: {tokens_bytes / 2**20:.0f}MB')
+    print(f'  ast:    {(total_bytes - tokens_bytes) / 2**20:.0f}MB')
+    print(f'  parse:   {parse_seconds:.2f}s (traced)')
+    print(f'  analyze: {analyze_seconds:.2f}s')
+    print(f'  print:   {print_seconds:.2f}s')
+
+
+if __name__ == '__main__':
+    main()
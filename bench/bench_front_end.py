@@ -0,0 +1,72 @@
+import argparse
+import time
+
+from tnl.gc_pause import paused_gc
+from tnl.lexer import Lexer
+from tnl.parser import Parser
+from tnl.semantic_analyzer import analyze
+
+
+# Times each stage of the front end (lex, parse, analyze) on generated
+# programs of growing size; the time per rule should stay flat. The
+# stages run with the garbage collector paused, as in the CLI. A 100k rule
+# program takes about 3s (30us per rule); finding its million tokens with
+# the lexer's regular expression alone, before any per-token python work,
+# takes about 0.8s.
+#
+#   python -m bench.bench_front_end --rules 1000 10000 100000
+
+RULES = [
+    '[\'col_{i}\'] -> trim | replace \'a{i}\' \'b\' | concat [\'other\'] \'-\'',
+    '[/col_{i}.*/] -> add {i} | mult 2',
+    '[\'col_{i}\'] -> divide {i} | round 2',
+    '[\'col_{i}\'] -> \'n/a\'',
+]
+
+
+def generate_src(num_rules: int) -> str:
+    lines = ['transform Bench {', '    headers {']
+    for i in range(num_rules // 10):
+        lines.append(f'        \'header_{i}\' -> upper | \'col_{i}\'')
+    lines.extend(['    }', '    values {'])
+    for i in range(num_rules - num_rules // 10):
+        lines.append('        ' + RULES[i % len(RULES)].format(i=i))
+    lines.extend(['    }', '}', ''])
+    return '\n'.join(lines)
+
+
+def main() -> None:
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument(
+        '--rules',
+        type=int,
+        nargs='+',
+        default=[1_000, 10_000, 100_000],
+    )
+    args = argparser.parse_args()
+
+    for num_rules in args.rules:
+        src = generate_src(num_rules)
+
+        with paused_gc():
+            start = time.perf_counter()
+            tokens = Lexer(src, 'bench').lex()
+            lexed = time.perf_counter()
+            ast = Parser(tokens, 'bench').parse()
+            parsed = time.perf_counter()
+            errors = analyze(ast)
+            analyzed = time.perf_counter()
+        assert not errors, errors[:3]
+
+        print(
+            f'{num_rules} rules: '
+            f'lex {lexed - start:.3f}s, '
+            f'parse {parsed - lexed:.3f}s, '
+            f'analyze {analyzed - parsed:.3f}s, '
+            f'total {analyzed - start:.3f}s '
+            f'({(analyzed - start) * 1e6 / num_rules:.1f}us per rule)'
+        )
+
+
+if __name__ == '__main__':
+    main()
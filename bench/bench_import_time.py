@@ -0,0 +1,47 @@
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+from typing import List
+
+
+# Times running `tnl --check` on a program, which only runs the front end
+# and so shouldn't import pandas, against importing pandas on its own.
+#
+#   python -m bench.bench_import_time --runs 20
+
+SRC_FILE = 'sample/movies.tnl'
+DATA_FILE = 'sample/movies.csv'
+
+COMMANDS = {
+    'python': [sys.executable, '-c', 'pass'],
+    'import pandas': [sys.executable, '-c', 'import pandas'],
+    'tnl --check': [
+        sys.executable, '-m', 'tnl', SRC_FILE, DATA_FILE, '--check',
+    ],
+    'tnl (transform)': [sys.executable, '-m', 'tnl', SRC_FILE, DATA_FILE],
+}
+
+
+def time_command(command: List[str], runs: int) -> float:
+    seconds = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+        seconds.append(time.perf_counter() - start)
+    return statistics.median(seconds)
+
+
+def main() -> None:
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument('--runs', type=int, default=10)
+    args = argparser.parse_args()
+
+    for name, command in COMMANDS.items():
+        seconds = time_command(command, args.runs)
+        print(f'{name}: {seconds * 1e3:.0f}ms (median of {args.runs})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+import argparse
+import time
+
+from tnl.lexer import Lexer
+from tnl.token import TokenKind
+
+
+# Times lexing a generated program of many rules, with both the regex fast
+# path and the character lexer.
+#
+#   python -m bench.bench_lexer --lines 100000
+
+def generate_src(num_lines: int) -> str:
+    lines = ['transform Bench {', '    values {']
+    for i in range(num_lines):
+        if i % 4 == 0:
+            lines.append(f'        # rule {i}')
+        elif i % 4 == 1:
+            lines.append(
+                f'        [\'col_{i}\'] -> trim | replace \'a{i}\' \'b\' | '
+                f'concat [\'other\'] \'-\''
+            )
+        elif i % 4 == 2:
+            lines.append(f'        [/col_{i}.*/] -> add {i} | mult 2')
+        else:
+            lines.append(f'        [\'col_{i}\'] -> divide {i} | round 2')
+    lines.extend(['    }', '}', ''])
+    return '\n'.join(lines)
+
+
+def main() -> None:
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument('--lines', type=int, default=100_000)
+    args = argparser.parse_args()
+
+    src = generate_src(args.lines)
+    start = time.perf_counter()
+    fast_tokens = Lexer(src, 'bench').lex_fast()
+    fast_seconds = time.perf_counter() - start
+    assert fast_tokens is not None
+    assert fast_tokens[-1].kind == TokenKind.EOF
+
+    start = time.perf_counter()
+    chars_tokens = Lexer(src, 'bench').lex_chars()
+    chars_seconds = time.perf_counter() - start
+    assert len(fast_tokens) == len(chars_tokens)
+
+    print(f'{args.lines} lines, {len(fast_tokens)} tokens:')
+    print(f'  lex_fast:  {fast_seconds:.2f}s')
+    print(f'  lex_chars: {chars_seconds:.2f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+import argparse
+import time
+
+import pandas as pd  # type: ignore
+
+from tnl.lexer import Lexer
+from tnl.parser import Parser
+from tnl.vm import transform
+
+
+# Times applying one program to many small frames, where the cost is the
+# per call overhead rather than the per row work.
+#
+#   python -m bench.bench_small_frames --frames 2000
+
+SRC = '''\
+transform Bench {
+    headers {
+        /c.*/ -> upper
+    }
+    values {
+        ['a'] -> add 1 | mult 2
+        ['b'] -> trim | title | replace 'Of' 'of'
+        ['C1'] -> 'n/a' | upper
+        ['C2'] -> max ['a'] 3
+        ['d'] -> concat ['b'] '!' | lower
+        ['e'] -> auto_inc
+    }
+}
+'''
+
+
+def main() -> None:
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument('--frames', type=int, default=2000)
+    argparser.add_argument('--rows', type=int, default=10)
+    args = argparser.parse_args()
+
+    tokens = Lexer(SRC, 'bench').lex()
+    ast = Parser(tokens, 'bench').parse()
+    data = pd.DataFrame({
+        'a': range(args.rows),
+        'b': [' the return of the king '] * args.rows,
+        'c1': ['x'] * args.rows,
+        'c2': range(args.rows),
+        'd': ['y'] * args.rows,
+        'e': [0] * args.rows,
+    })
+
+    start = time.perf_counter()
+    for _ in range(args.frames):
+        transform(ast, data.copy())
+    seconds = time.perf_counter() - start
+    print(
+        f'{args.frames} frames of {args.rows} rows: '
+        f'{seconds * 1e6 / args.frames:.0f}us per frame'
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+import argparse
+import time
+from typing import List
+from typing import Tuple
+
+import pandas as pd  # type: ignore
+
+from tnl.lexer import Lexer
+from tnl.parser import Parser
+from tnl.plan import compile_plan
+from tnl.plan import Plan
+from tnl.vm import transform
+
+
+# Times single-map value rules over one string column, so the per-row
+# cost of each built-in string map can be compared directly. Columns with
+# few distinct values run on the distinct values only, which `--distinct`
+# shows (by default every row is distinct).
+#
+#   python -m bench.bench_string_maps --rows 1000000 --distinct 300
+
+PIPELINES = [
+    'trim',
+    'upper',
+    'replace_last \',\' \', and\'',
+    'remove_prefix \'Jim \'',
+    'remove_suffix \' V.\'',
+    'format \'Producers: {}\'',
+    # merged into one multi-pattern replace; 4 of the names occur
+    ' | '.join(f'replace \'{name}\' \'#{i}\'' for i, name in enumerate([
+        'Adam', 'Alice', 'Anna', 'Ben', 'Carl', 'Charles', 'Dan', 'Dora',
+        'Emma', 'Eric', 'Frank', 'Gina', 'Hugo', 'Ivy', 'Jim', 'Kate',
+        'Leo', 'Mary', 'Nick', 'Olga', 'Paul', 'Peter', 'Rosa', 'Sam',
+        'Tina', 'Uma', 'Vera', 'Walt', 'Yuri', 'Zoe',
+    ])),
+]
+
+VALUE = 'Jim Burke, Charles B. Wessler, Peter Farrelly, Nick V.'
+
+
+def compile_pipeline(pipeline: str) -> Plan:
+    src = (
+        'transform Bench {\n'
+        '    values {\n'
+        f'        [\'a\'] -> {pipeline}\n'
+        '    }\n'
+        '}\n'
+    )
+    tokens = Lexer(src, 'bench').lex()
+    ast = Parser(tokens, 'bench').parse()
+    return compile_plan(ast)
+
+
+def time_pipeline(pipeline: str, data: pd.DataFrame, repeat: int) -> float:
+    plan = compile_pipeline(pipeline)
+    timings: List[float] = []
+    for _ in range(repeat):
+        frame = data.copy()
+        start = time.perf_counter()
+        transform(plan, frame)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument('--rows', type=int, default=1_000_000)
+    argparser.add_argument('--repeat', type=int, default=3)
+    argparser.add_argument('--distinct', type=int)
+    args = argparser.parse_args()
+
+    distinct = args.distinct or args.rows
+    data = pd.DataFrame({
+        # 'Jim Burke 17, Charles ...', which every pipeline still matches
+        'a': [
+            VALUE.replace('Burke', f'Burke {i % distinct}')
+            for i in range(args.rows)
+        ],
+    })
+    results: List[Tuple[str, float]] = []
+    for pipeline in PIPELINES:
+        results.append((pipeline, time_pipeline(pipeline, data, args.repeat)))
+
+    baseline = min(seconds for pipeline, seconds in results[:2])
+    print(f'{args.rows} rows, {distinct} distinct, best of {args.repeat}')
+    for pipeline, seconds in results:
+        print(f'{pipeline[:32]:32} {seconds:8.3f}s {seconds / baseline:6.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+import argparse
+import os
+import random
+import tempfile
+import time
+from functools import partial
+from typing import Optional
+
+from tnl.lexer import Lexer
+from tnl.parser import Parser
+from tnl.plan import compile_plan
+from tnl.plan import Plan
+from tnl.raw_columns import transform_csv
+from tnl.vm import transform
+
+
+# Times transforming a wide csv file with a program that touches 3 of its
+# columns, reading every column with pandas and reading only the touched
+# ones (the others carried through as text, see `tnl.raw_columns`).
+#
+#   python -m bench.bench_wide_csv --rows 100000 --columns 150
+
+SRC = '''\
+transform Bench {
+    values {
+        ['c1'] -> trim | upper
+        ['c2'] -> add 1
+        ['c3'] -> concat ['c1'] '-'
+    }
+}
+'''
+
+VALUES = ['1.50', '007', ' abc ', '12', 'x y', '', '3.25']
+
+
+def write_csv(path: str, rows: int, columns: int) -> None:
+    rng = random.Random(0)
+    with open(path, 'w') as fp:
+        fp.write(','.join(f'c{i}' for i in range(columns)) + '\n')
+        for row in range(rows):
+            values = [rng.choice(VALUES) for _ in range(columns)]
+            values[2] = str(row)
+            fp.write(','.join(values) + '\n')
+
+
+def time_transform(
+    plan: Plan,
+    data_file: str,
+    raw_columns_plan: Optional[Plan],
+    repeat: int,
+) -> float:
+    transform_data = partial(transform, plan)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        transform_csv(transform_data, data_file, raw_columns_plan)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument('--rows', type=int, default=100_000)
+    argparser.add_argument('--columns', type=int, default=150)
+    argparser.add_argument('--repeat', type=int, default=3)
+    args = argparser.parse_args()
+
+    tokens = Lexer(SRC, 'bench').lex()
+    plan = compile_plan(Parser(tokens, 'bench').parse())
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        data_file = os.path.join(tmp_dir, 'wide.csv')
+        write_csv(data_file, args.rows, args.columns)
+        every_column = time_transform(plan, data_file, None, args.repeat)
+        touched_columns = time_transform(plan, data_file, plan, args.repeat)
+
+    print(f'{args.rows} rows, {args.columns} columns, best of {args.repeat}')
+    print(f'every column     {every_column:8.3f}s')
+    print(f'touched columns  {touched_columns:8.3f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+from functools import partial
+
+import pandas as pd  # type: ignore
+import pytest
+
+from test.utils import parse_src
+from tnl.batch import expand_data_file
+from tnl.batch import output_file
+from tnl.batch import transform_files
+from tnl.parallel import transform_files_parallel
+from tnl.plan import compile_plan
+from tnl.vm import transform
+
+
+SRC = '''\
+transform Test {
+    headers {
+        'a' -> 'id'
+    }
+    values {
+        ['id'] -> auto_inc
+        ['b'] -> add 1
+        ['c'] -> trim | upper
+    }
+}
+'''
+
+DATA_STRS = [
+    'a,b,c\nx,1, hello \ny,2,world\n',
+    'a,b,c\nz,3,  foo\n',
+    'a,b,c\nw,,bar \nv,5,baz\nu,6,\n',
+]
+
+
+def write_data_files(data_dir):
+    data_dir.mkdir()
+    data_files = []
+    for i, data_str in enumerate(DATA_STRS):
+        data_file = data_dir / f'data{i}.csv'
+        data_file.write_text(data_str)
+        data_files.append(str(data_file))
+    (data_dir / 'notes.txt').write_text('not data')
+    return data_files
+
+
+def test_expand_data_file(tmp_path):
+    data_files = write_data_files(tmp_path / 'in')
+    assert expand_data_file(str(tmp_path / 'in')) == data_files
+    assert expand_data_file(str(tmp_path / 'in' / 'data[02].csv')) == [
+        data_files[0],
+        data_files[2],
+    ]
+    assert expand_data_file(data_files[1]) == [data_files[1]]
+    assert expand_data_file(str(tmp_path / 'in' / '*.tsv')) == []
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+@pytest.mark.parametrize('chunk_size', [None, 1])
+def test_transform_files_matches_transform(tmp_path, jobs, chunk_size):
+    ast = parse_src(SRC)
+    data_files = write_data_files(tmp_path / 'in')
+    output_dir = tmp_path / 'out'
+    output_dir.mkdir()
+    file_pairs = [
+        (data_file, output_file(data_file, str(output_dir)))
+        for data_file in data_files
+    ]
+    if jobs > 1:
+        transform_files_parallel(ast, file_pairs, jobs, chunk_size=chunk_size)
+    else:
+        transform_data = partial(transform, compile_plan(ast))
+        transform_files(transform_data, file_pairs, chunk_size)
+
+    for data_file, out_file in file_pairs:
+        expected = transform(ast, pd.read_csv(data_file))
+        with open(out_file) as fp:
+            assert fp.read() == expected.to_csv(index=False) + '\n'
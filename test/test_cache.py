@@ -0,0 +1,105 @@
+import os
+
+import pandas as pd  # type: ignore
+
+from test.utils import parse_src
+import tnl.cache
+from tnl.cache import cache_file
+from tnl.cache import cache_key
+from tnl.cache import load_cached_program
+from tnl.cache import store_cached_program
+from tnl.code_printer import print_module_code
+from tnl.optimizer import optimize
+from tnl.semantic_analyzer import analyze
+from tnl.vm import transform
+
+
+SRC = '''\
+transform Test {
+    headers {
+        'a' -> upper
+    }
+    values {
+        ['A'] -> trim | upper | 'n/a'
+        ['b'] -> add 1
+    }
+}
+'''
+
+
+def compile_program(src):
+    ast = parse_src(src)
+    assert analyze(ast) == []
+    notes = optimize(ast)
+    return ast, notes
+
+
+def module_code(ast, capsys):
+    print_module_code(ast)
+    return capsys.readouterr().out
+
+
+def test_cached_program_round_trips(tmp_path, capsys):
+    cache_dir = str(tmp_path / 'cache')
+    assert load_cached_program(cache_dir, SRC) is None
+
+    ast, notes = compile_program(SRC)
+    data = pd.DataFrame({'a': [' x'], 'b': [1]})
+    expected = transform(ast, data.copy())
+    store_cached_program(cache_dir, SRC, (ast, notes))
+    assert os.listdir(cache_dir) == [os.path.basename(cache_file(cache_dir, SRC))]
+
+    cached_program = load_cached_program(cache_dir, SRC)
+    assert cached_program is not None
+    cached_ast, cached_notes = cached_program
+    assert cached_notes == notes
+    assert module_code(cached_ast, capsys) == module_code(ast, capsys)
+    pd.testing.assert_frame_equal(transform(cached_ast, data.copy()), expected)
+
+    assert load_cached_program(cache_dir, SRC.replace('add 1', 'add 2')) is None
+
+
+def test_unreadable_cache_entry_is_a_miss(tmp_path):
+    cache_dir = str(tmp_path)
+    with open(cache_file(cache_dir, SRC), 'wb') as fp:
+        fp.write(b'\x80\x05truncated')
+    assert load_cached_program(cache_dir, SRC) is None
+
+
+def test_cache_key_covers_tnl_version(monkeypatch):
+    key = cache_key(SRC)
+    monkeypatch.setattr(tnl.cache.tnl, '__version__', '0.0.0-test')
+    assert cache_key(SRC) != key
+
+
+def test_entry_is_a_miss_when_lookup_table_moves(tmp_path):
+    table_file = tmp_path / 'table.csv'
+    table_file.write_text('k,v\nx,1\n')
+    src = f'''\
+transform Test {{
+    values {{
+        ['a'] -> lookup '{table_file}' 'k' 'v'
+    }}
+}}
+'''
+    cache_dir = str(tmp_path / 'cache')
+    store_cached_program(cache_dir, src, compile_program(src))
+    assert load_cached_program(cache_dir, src) is not None
+
+    table_file.write_text('key,v\nx,1\n')
+    assert load_cached_program(cache_dir, src) is None
+    table_file.unlink()
+    assert load_cached_program(cache_dir, src) is None
+
+
+def test_cache_dir_is_private(tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    store_cached_program(cache_dir, SRC, compile_program(SRC))
+    assert os.stat(cache_dir).st_mode & 0o777 == 0o700
+    assert load_cached_program(cache_dir, SRC) is not None
+
+    os.chmod(cache_dir, 0o770)
+    assert load_cached_program(cache_dir, SRC) is None
+    os.remove(cache_file(cache_dir, SRC))
+    store_cached_program(cache_dir, SRC, compile_program(SRC))
+    assert os.listdir(cache_dir) == []
@@ -0,0 +1,102 @@
+import io
+
+import pandas as pd  # type: ignore
+import pytest
+
+from tnl.codegen import generate_pandas_module
+from tnl.lexer import Lexer
+from tnl.parser import Parser
+from tnl.vm import transform
+
+
+DATA_STR = '''\
+a,b,c,d1,d2
+1,2, hello world ,x,7
+3,,Hello World,y,8
+5,6,,z,9
+'''
+
+
+@pytest.mark.parametrize('src', [
+    pytest.param(
+        '''\
+transform Test {
+    headers {
+        'a' -> 'AA' | replace 'A' 'D'
+        /d.*/ -> upper | replace 'D' 'e'
+        'b' -> 'B'
+    }
+    values {
+        ['DD'] -> add 1 | mult 2 | power 2 | divide 3
+        ['B'] -> max ['DD'] 4 | round 1
+    }
+}
+''',
+        id='headers_and_arithmetic',
+    ),
+    pytest.param(
+        '''\
+transform Test {
+    values {
+        ['c'] -> trim | title | replace_last ' ' '_' | format '<{}>'
+        [/d.*/] -> ' q ' | trim | upper
+        ['a'] -> ['d1'] | concat ['d1'] '!' | lower
+        ['b'] -> concat 'p' 'q' | upper
+    }
+}
+''',
+        id='string_maps_and_literals',
+    ),
+    pytest.param(
+        '''\
+transform Test {
+    values {
+        ['a'] -> auto_inc
+        ['b'] -> mean ['a'] 4 2
+        ['c'] -> min 1 2 | add 1
+        ['d1'] -> remove_prefix 'x' | slice 0 1
+        ['d2'] -> 'n/a'
+        ['e'] -> 'missing'
+        ['d3'] -> trim
+    }
+}
+''',
+        id='constants_and_auto_inc',
+    ),
+    pytest.param(
+        '''\
+transform Test {
+    values {
+        ['c'] -> %s
+        ['d1'] -> replace 'x' 'X' | replace 'y' 'Y'
+    }
+}
+''' % ' | '.join(f"replace '{a}' '{b}'" for a, b in zip(
+            'oelHWrd hwxyzqkj',
+            '031#VRD_456789 %',
+        )),
+        id='replace_chains',
+    ),
+    pytest.param(
+        '''\
+transform Test {
+    headers {
+        'a' -> 'b'
+        /^[bc]$/ -> upper
+        'B' -> 'd1'
+        /.*/ -> replace '1' '2'
+    }
+}
+''',
+        id='renames_merging_columns',
+    ),
+])
+def test_generated_module_matches_vm(src: str) -> None:
+    tokens = Lexer(src, 'test').lex()
+    ast = Parser(tokens, 'test').parse()
+    namespace: dict = {}
+    exec(generate_pandas_module(ast, 'test'), namespace)
+
+    expected = transform(ast, pd.read_csv(io.StringIO(DATA_STR)))
+    result = namespace['transform'](pd.read_csv(io.StringIO(DATA_STR)))
+    pd.testing.assert_frame_equal(result, expected)
@@ -40,6 +40,39 @@ transform T {
         'Invalid regex pattern /*/.',
         id='invalid_pattern',
     ),
+    pytest.param(
+        '''
+transform T {
+    headers {
+        /col_.**/ -> 'world'
+    }
+}
+        ''',
+        'Invalid regex pattern /col_.**/.',
+        id='invalid_pattern_with_wildcard',
+    ),
+    pytest.param(
+        '''
+transform T {
+    values {
+        ['country'] -> lookup 'no/such/table.csv' 'code' 'name'
+    }
+}
+        ''',
+        'Can\'t find lookup table no/such/table.csv.',
+        id='missing_lookup_table',
+    ),
+    pytest.param(
+        '''
+transform T {
+    values {
+        ['country'] -> lookup_pairs 'US' ['name']
+    }
+}
+        ''',
+        'lookup_pairs takes only strings and numbers.',
+        id='lookup_pairs_column_selector',
+    ),
 ])
 def test_pretty_print_code(capsys, src, expected_error_message):
     lexer = Lexer(src, 'test')
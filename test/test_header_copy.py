@@ -0,0 +1,88 @@
+import io
+
+import pandas as pd  # type: ignore
+import pytest
+
+from test.utils import compile_src
+from tnl.header_copy import copy_with_header
+from tnl.header_copy import is_header_only
+from tnl.vm import transform
+
+
+SRC = '''\
+transform Test {
+    headers {
+        'a' -> 'id'
+        /c.*/ -> upper | replace 'C' 'see,'
+    }
+    headers {
+        'id' -> 'key'
+    }
+}
+'''
+
+
+def test_is_header_only() -> None:
+    assert is_header_only(compile_src(SRC))
+    assert not is_header_only(compile_src('''\
+transform Test {
+    headers {
+        'a' -> 'id'
+    }
+    values {
+        ['id'] -> trim
+    }
+}
+'''))
+
+
+@pytest.mark.parametrize('header, mapped_header, body', [
+    pytest.param(
+        b'a,b,c1\n',
+        b'key,b,"see,1"\n',
+        b'1,1.50,007\n2,,x\n',
+        id='values_kept_as_is',
+    ),
+    pytest.param(
+        b'a,b,c1\r\n',
+        b'key,b,"see,1"\r\n',
+        b'1,"x\r\ny",3\r\n',
+        id='crlf_and_quoted_newline',
+    ),
+    pytest.param(
+        b'\xef\xbb\xbf"a","b\nb",c1\n',
+        b'key,"b\nb","see,1"\n',
+        b'1,2,3',
+        id='bom_and_quoted_names',
+    ),
+    pytest.param(b'a,b\n', b'key,b\n', b'', id='no_rows'),
+])
+def test_copy_with_header(tmp_path, header, mapped_header, body) -> None:
+    plan = compile_src(SRC)
+    data_file = tmp_path / 'data.csv'
+    data_file.write_bytes(header + body)
+    out = io.BytesIO()
+    assert copy_with_header(plan, str(data_file), out)
+    assert out.getvalue() == mapped_header + body
+
+    expected = transform(plan, pd.read_csv(str(data_file)))
+    result = pd.read_csv(io.BytesIO(out.getvalue()))
+    pd.testing.assert_frame_equal(result, expected)
+
+
+@pytest.mark.parametrize('file_name, data_bytes', [
+    pytest.param('data.csv', b'a,a,c1\n1,2,3\n', id='duplicate_names'),
+    pytest.param('data.csv', b'a,,c1\n1,2,3\n', id='empty_name'),
+    pytest.param('data.csv', b'\na,b\n1,2\n', id='blank_first_line'),
+    pytest.param('data.csv', b'a,b', id='no_line_terminator'),
+    pytest.param('data.csv', b'a,b\r1,2\r', id='cr_line_terminators'),
+    pytest.param('data.csv', b'a,\xff\n1,2\n', id='not_utf8'),
+    pytest.param('data.csv.gz', b'a,b\n1,2\n', id='compressed'),
+])
+def test_copy_with_header_falls_back(tmp_path, file_name, data_bytes) -> None:
+    plan = compile_src(SRC)
+    data_file = tmp_path / file_name
+    data_file.write_bytes(data_bytes)
+    out = io.BytesIO()
+    assert not copy_with_header(plan, str(data_file), out)
+    assert out.getvalue() == b''
@@ -1,10 +1,15 @@
 import io
 
+import numpy as np
 import pandas as pd  # type: ignore
 import pytest
 
 from tnl.lexer import Lexer
 from tnl.parser import Parser
+from tnl.plan import compile_plan
+from tnl.plan import ValueStep
+import tnl.vm
+from tnl.vm import schedule_value_steps
 from tnl.vm import transform
 
 
@@ -563,11 +568,213 @@ a,b,c
         ''',
         id='min',
     ),
+    pytest.param(
+        '''\
+transform Test {
+    headers {
+        'a' -> 'tmp'
+        'b' -> 'a'
+        'tmp' -> 'b'
+        'c' -> 'd'
+        'd' -> upper
+    }
+}
+        ''',
+        '''\
+a,b,c
+1,2,3
+        ''',
+        '''\
+b,a,D
+1,2,3
+        ''',
+        id='header_renames_apply_in_order',
+    ),
+    pytest.param(
+        '''\
+transform Test {
+    headers {
+        'a' -> 'b'
+        /b/ -> 'c'
+    }
+}
+        ''',
+        '''\
+a,b,x
+1,2,3
+        ''',
+        '''\
+c,c,x
+1,2,3
+        ''',
+        id='header_renames_merge_columns',
+    ),
+    pytest.param(
+        '''\
+transform Test {
+    values {
+        ['c'] -> ['b'] | add 1
+        ['a'] -> ['a']
+        ['b'] -> mult 2
+    }
+}
+        ''',
+        '''\
+a,b,c
+x,1,placeholder
+y,2,placeholder
+        ''',
+        '''\
+a,b,c
+x,2,2
+y,4,3
+        ''',
+        id='column_selectors_are_not_modified',
+    ),
+    pytest.param(
+        '''\
+transform Test {
+    values {
+        ['source'] -> 'feed_a' | upper | replace '_' ' '
+        ['n'] -> 7 | add 1
+        ['m'] -> mean 1 2 | round 0
+    }
+}
+        ''',
+        '''\
+source,n,m
+x,1,1
+y,2,2
+        ''',
+        '''\
+source,n,m
+FEED A,8,2.0
+FEED A,8,2.0
+        ''',
+        id='literal_pipelines',
+    ),
+    pytest.param(
+        '''\
+transform Test {
+    values {
+        ['max'] -> max ['a'] ['b'] ['c'] 2
+        ['min'] -> min ['a'] ['b'] ['c']
+        ['mean'] -> mean ['a'] ['b'] ['c'] 6
+    }
+}
+        ''',
+        '''\
+a,b,c,max,min,mean
+1,5,3,0,0,0
+4,,1,0,0,0
+        ''',
+        '''\
+a,b,c,max,min,mean
+1,5.0,3,5.0,1.0,3.75
+4,,1,4.0,1.0,
+        ''',
+        id='variadic_max_min_mean',
+    ),
+    pytest.param(
+        '''\
+transform Test {
+    values {
+        ['id'] -> auto_inc
+        ['id'] -> max ['id'] 2
+        ['n'] -> max ['n'] 2
+    }
+}
+        ''',
+        '''\
+id,n
+0,1
+0,3
+0,2
+        ''',
+        '''\
+id,n
+2.0,2
+2.0,3
+3.0,2
+        ''',
+        id='max_of_auto_inc_and_literal',
+    ),
+    pytest.param(
+        '''\
+transform Test {
+    headers {
+        'x' -> concat 'a' '_' 'b' '_' 'c'
+    }
+    values {
+        ['a_b_c'] -> concat ['a'] '-' ['b'] '-' ['a']
+    }
+}
+        ''',
+        '''\
+a,b,x
+p,q,placeholder
+        ''',
+        '''\
+a,b,a_b_c
+p,q,p-q-p
+        ''',
+        id='variadic_concat',
+    ),
+    pytest.param(
+        '''\
+transform Test {
+    values {
+        ['c'] -> add 1
+        [/[ab]/] -> add ['a']
+        ['d'] -> mult ['c']
+    }
+}
+        ''',
+        '''\
+a,b,c,d
+1,10,100,2
+        ''',
+        '''\
+a,b,c,d
+2,12,101,202
+        ''',
+        id='pattern_rule_reads_column_it_writes',
+    ),
+    pytest.param(
+        '''\
+transform Test {
+    headers {
+        'c' -> lookup_pairs 'c' 'code'
+    }
+    values {
+        ['code'] -> lookup_pairs 'US' 'United States' 'FR' 'France' 'other'
+        ['n'] -> trim | lookup_pairs 'a' 'one' 2 'two'
+    }
+}
+        ''',
+        '''\
+c,n
+US, a
+FR,2
+DE,3
+,4
+        ''',
+        '''\
+code,n
+United States,one
+France,two
+other,3
+,4
+        ''',
+        id='lookup_pairs',
+    ),
 ])
+@pytest.mark.parametrize('workers', [1, 4])
 def test_interpret(
     src: str,
     input_data_str: str,
     expected_result_data_str: str,
+    workers: int,
 ) -> None:
     lexer = Lexer(src, 'test')
     tokens = lexer.lex()
@@ -576,7 +783,7 @@ def test_interpret(
 
     data = pd.read_csv(io.StringIO(input_data_str.strip()))
 
-    transformed_data = transform(ast, data)
+    transformed_data = transform(ast, data, workers=workers)
 
     output_buffer = io.StringIO()
     transformed_data.to_csv(output_buffer, index=False)
@@ -584,3 +791,195 @@ def test_interpret(
     result_data_str = output_buffer.read()
 
     assert result_data_str.strip() == expected_result_data_str.strip()
+
+
+def test_interpret_reuses_compiled_plan() -> None:
+    src = '''\
+transform Test {
+    headers {
+        'a' -> upper
+    }
+    values {
+        ['A'] -> add 1
+    }
+}
+    '''
+    tokens = Lexer(src, 'test').lex()
+    ast = Parser(tokens, 'test').parse()
+    plan = compile_plan(ast)
+
+    for n in (1, 3):
+        data = pd.DataFrame({'a': range(n)})
+        transformed_data = transform(plan, data)
+        assert list(transformed_data.columns) == ['A']
+        assert list(transformed_data['A']) == list(range(1, n + 1))
+
+
+def test_interpret_keeps_index() -> None:
+    src = '''\
+transform Test {
+    values {
+        ['a'] -> 'x'
+        ['b'] -> auto_inc
+        ['c'] -> max 1 2
+    }
+}
+    '''
+    tokens = Lexer(src, 'test').lex()
+    ast = Parser(tokens, 'test').parse()
+
+    data = pd.DataFrame(
+        {'a': ['p', 'q'], 'b': [0, 0], 'c': [0, 0]},
+        index=[10, 20],
+    )
+    transformed_data = transform(ast, data)
+
+    assert list(transformed_data.index) == [10, 20]
+    assert list(transformed_data['a']) == ['x', 'x']
+    assert list(transformed_data['b']) == [1, 2]
+    assert list(transformed_data['c']) == [2, 2]
+
+
+def test_schedule_value_steps_orders_dependent_rules() -> None:
+    src = '''\
+transform Test {
+    values {
+        ['a'] -> add 1
+        ['b'] -> add 1
+        ['c'] -> max ['a'] ['b']
+        ['a'] -> mult 2
+        [/[bd]/] -> add ['c']
+        ['e'] -> concat ['a'] 'x'
+    }
+}
+    '''
+    tokens = Lexer(src, 'test').lex()
+    ast = Parser(tokens, 'test').parse()
+    plan = compile_plan(ast)
+    steps = [step for step in plan.steps if isinstance(step, ValueStep)]
+
+    levels = schedule_value_steps(steps, ['a', 'b', 'c', 'd', 'e'])
+
+    assert [[steps.index(step) for step in level] for level in levels] == [
+        [0, 1],
+        [2],
+        [3, 4],
+        [5],
+    ]
+
+
+def test_schedule_value_steps_runs_self_reading_rules_alone() -> None:
+    src = '''\
+transform Test {
+    values {
+        ['c'] -> add 1
+        [/[ab]/] -> add ['a']
+        ['d'] -> add 1
+        ['e'] -> add ['c']
+    }
+}
+    '''
+    tokens = Lexer(src, 'test').lex()
+    ast = Parser(tokens, 'test').parse()
+    plan = compile_plan(ast)
+    steps = [step for step in plan.steps if isinstance(step, ValueStep)]
+
+    levels = schedule_value_steps(steps, ['a', 'b', 'c', 'd', 'e'])
+
+    assert [[steps.index(step) for step in level] for level in levels] == [
+        [0, 2],
+        [1],
+        [3],
+    ]
+
+
+@pytest.mark.parametrize('src', [
+    pytest.param(
+        '''\
+transform Test {
+    values {
+        ['a'] -> 'x'
+        ['b'] -> concat ['a'] ['c']
+        ['c'] -> 'Z'
+    }
+}
+        ''',
+        id='write_after_read',
+    ),
+    pytest.param(
+        '''\
+transform Test {
+    values {
+        [/^[ab]$/] -> concat ['a'] ['y']
+        ['y'] -> 'Z'
+    }
+}
+        ''',
+        id='self_reading_rule_then_write',
+    ),
+    pytest.param(
+        '''\
+transform Test {
+    values {
+        ['y'] -> concat ['y'] '!'
+        [/^[ab]$/] -> concat ['a'] ['y']
+        ['c'] -> concat ['a'] ['b']
+        ['a'] -> 'Z'
+    }
+}
+        ''',
+        id='chained',
+    ),
+])
+def test_interpret_concurrently_matches_sequential(src: str) -> None:
+    tokens = Lexer(src, 'test').lex()
+    ast = Parser(tokens, 'test').parse()
+    data = pd.DataFrame({
+        'a': ['1', '2'],
+        'b': ['3', '4'],
+        'c': ['5', '6'],
+        'y': ['p', 'q'],
+    })
+
+    expected = transform(ast, data.copy())
+    transformed_data = transform(ast, data.copy(), workers=4)
+
+    pd.testing.assert_frame_equal(transformed_data, expected)
+
+
+@pytest.mark.parametrize('pipeline', [
+    pytest.param('trim | title | replace \'Of\' \'of\'', id='fused'),
+    pytest.param('format \'<{}>\'', id='format'),
+    pytest.param('upper | slice 0 3', id='upper_slice'),
+    pytest.param('concat \'x\' \'y\' | upper', id='constant'),
+])
+@pytest.mark.parametrize('dtype', [object, 'string'])
+def test_interpret_dictionary_encoding_matches_per_row(
+    monkeypatch,
+    pipeline: str,
+    dtype: str,
+) -> None:
+    src = f'''\
+transform Test {{
+    values {{
+        ['a'] -> {pipeline}
+        ['b'] -> {pipeline}
+    }}
+}}
+    '''
+    tokens = Lexer(src, 'test').lex()
+    ast = Parser(tokens, 'test').parse()
+    values = [' the return of the king ', 'of mice and men', None, 'x']
+    data = pd.DataFrame({
+        'a': pd.Series(values * 50, dtype=dtype),
+        # all distinct, so never dictionary encoded
+        'b': pd.Series([f'{i} of' for i in range(200)], dtype=dtype),
+    })
+    monkeypatch.setattr(tnl.vm, 'DICTIONARY_MIN_ROWS', np.inf)
+    expected = transform(ast, data.copy())
+    monkeypatch.setattr(tnl.vm, 'DICTIONARY_MIN_ROWS', 100)
+    monkeypatch.setattr(tnl.vm, 'DICTIONARY_SAMPLE_SIZE', 20)
+    assert tnl.vm.is_low_cardinality_string(data['a'])
+    assert not tnl.vm.is_low_cardinality_string(data['b'])
+    result = transform(ast, data.copy())
+    pd.testing.assert_frame_equal(result, expected)
@@ -0,0 +1,63 @@
+import gc
+
+import pytest
+
+from tnl.lexer import Lexer
+from tnl.parser import Parser
+from tnl.semantic_analyzer import analyze
+
+
+def token_tuples(tokens):
+    return [(token.kind, token.lexeme, token.loc) for token in tokens]
+
+
+@pytest.mark.parametrize('src', [
+    pytest.param('', id='empty'),
+    pytest.param(
+        'transform T {\n'
+        '    # a comment\n'
+        '    values {\n'
+        '        [/c.*/] -> concat \'a\\\'b\' \'\' | format \'{}\'\n'
+        '        [\'x\'] -> [\'a\'] / 2 | [\'b\'] / [\'c\'] / 3\n'
+        '        [\'y\'] -> True == False = !a - b->c % d * e + f\n'
+        '    }\n'
+        '}\n',
+        id='tokens',
+    ),
+    pytest.param("a 'x\ny' /p\nq/ b\n", id='newlines_in_literals'),
+    pytest.param('a /\\// /\\\\\\// b /\t2/ c\n', id='escaped_patterns'),
+    pytest.param('a\r\n\t$ ., _1 09x\n', id='invalid_chars'),
+    pytest.param('# only a comment\n#\n', id='comments'),
+    pytest.param(
+        "['a b'] [''] [ 'c' ] ['d\\'e'] ['f\ng'] [name] ['h']",
+        id='column_selectors',
+    ),
+])
+def test_lex_fast_matches_lex_chars(src):
+    fast_tokens = Lexer(src, 'test').lex_fast()
+    assert fast_tokens is not None
+    chars_tokens = Lexer(src, 'test').lex_chars()
+    assert token_tuples(fast_tokens) == token_tuples(chars_tokens)
+
+
+@pytest.mark.parametrize('src', [
+    pytest.param('a', id='name_at_eof'),
+    pytest.param('a 1', id='number_at_eof'),
+    pytest.param('a -', id='sub_at_eof'),
+    pytest.param("a 'b\n", id='unterminated_string'),
+    pytest.param('a /b\\/\n', id='unterminated_pattern'),
+    pytest.param('a # comment', id='comment_at_eof'),
+])
+def test_lex_fast_leaves_errors_to_lex_chars(src):
+    assert Lexer(src, 'test').lex_fast() is None
+
+
+def test_front_end_leaves_gc_alone(monkeypatch):
+    # pausing the collector is process wide, so only the CLI does it
+    def disable():
+        raise AssertionError('gc disabled')
+
+    monkeypatch.setattr(gc, 'disable', disable)
+    src = 'transform T {\n    values {\n        [/a.*/] -> trim\n    }\n}\n'
+    tokens = Lexer(src, 'test').lex()
+    assert analyze(Parser(tokens, 'test').parse()) == []
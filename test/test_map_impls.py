@@ -0,0 +1,105 @@
+import subprocess
+import sys
+
+import pandas as pd  # type: ignore
+import pytest
+
+from tnl.map_impls import MAP_STRING_IMPL_REGISTRY
+from tnl.map_impls import MAP_VALUES_IMPL_REGISTRY
+from tnl.map_impls import MultiReplaceImpl
+from tnl.map_specs import MAP_SPECS
+
+
+VALUES = ['a, b, c', ' a ', '', 'noise', 'x,', 'prefix-noise']
+
+
+@pytest.mark.parametrize('map_name,args', [
+    pytest.param('replace_last', (',', ', and'), id='replace_last'),
+    pytest.param('replace_last', ('a', '\\1'), id='replace_last_backslash'),
+    pytest.param('remove_prefix', ('prefix-',), id='remove_prefix'),
+    pytest.param('remove_suffix', ('noise',), id='remove_suffix'),
+    pytest.param('format', ('{}',), id='format_field_only'),
+    pytest.param('format', ('<{}>',), id='format_simple'),
+    pytest.param('format', ('{{{0}}}',), id='format_escaped_braces'),
+    pytest.param('format', ('{:>8}',), id='format_spec'),
+    pytest.param('format', ('{!r}',), id='format_conversion'),
+    pytest.param('lookup_pairs', (' a ', 'A', 'noise', 'N'), id='lookup_pairs'),
+    pytest.param(
+        'lookup_pairs',
+        ('', 'empty', 'x,', 'x', 'a, b, c', 'a', 'a', 'b', '?'),
+        id='lookup_pairs_default',
+    ),
+])
+def test_map_values_matches_map_string(map_name, args):
+    s = pd.Series(VALUES)
+    result = MAP_VALUES_IMPL_REGISTRY[map_name].map_values(s, *args)
+    map_string = MAP_STRING_IMPL_REGISTRY[map_name].map_string
+    assert result.tolist() == [map_string(x, *args) for x in VALUES]
+
+
+def test_format_formats_missing_values():
+    s = pd.Series(['a', None, float('nan')], dtype=object)
+    result = MAP_VALUES_IMPL_REGISTRY['format'].map_values(s, '<{}>')
+    assert result.tolist() == ['<a>', '<None>', '<nan>']
+
+
+@pytest.mark.parametrize('map_name,args', [
+    pytest.param('replace_last', ('a', 'b'), id='replace_last'),
+    pytest.param('remove_prefix', ('a',), id='remove_prefix'),
+    pytest.param('remove_suffix', ('a',), id='remove_suffix'),
+])
+@pytest.mark.parametrize('dtype', ['str', object])
+def test_map_values_keep_dtype_of_missing_values(map_name, args, dtype):
+    s = pd.Series([None, float('nan')], dtype=dtype)
+    result = MAP_VALUES_IMPL_REGISTRY[map_name].map_values(s, *args)
+    assert result.dtype == s.dtype
+    assert result.str.upper().isna().all()
+
+
+@pytest.mark.parametrize('dtype', ['str', object])
+def test_multi_replace_keeps_dtype_of_missing_values(dtype):
+    s = pd.Series([None, float('nan')], dtype=dtype)
+    result = MultiReplaceImpl.map_values(s, 'a', 'b', 'c', 'd')
+    assert result.dtype == s.dtype
+    assert result.str.upper().isna().all()
+
+
+def test_map_specs_match_map_impls():
+    assert set(MAP_VALUES_IMPL_REGISTRY) == set(MAP_SPECS)
+    assert set(MAP_STRING_IMPL_REGISTRY) == {
+        name for name, spec in MAP_SPECS.items() if spec.maps_strings
+    }
+
+
+def test_front_end_does_not_import_pandas():
+    code = (
+        'import sys\n'
+        'import tnl.cli, tnl.lexer, tnl.parser, tnl.semantic_analyzer\n'
+        'print(\'pandas\' in sys.modules, \'numpy\' in sys.modules)\n'
+    )
+    result = subprocess.run(
+        [sys.executable, '-c', code],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    assert result.stdout == 'False False\n'
+
+
+def test_lookup_reads_table_once(tmp_path):
+    table_file = tmp_path / 'countries.csv'
+    table_file.write_text('code,name,unused\nUS,United States,\nNA,Namibia,\n')
+    args = (str(table_file), 'code', 'name', 'unknown')
+    s = pd.Series(['US', 'NA', 'FR', None], dtype=object)
+
+    LookupImpl = MAP_VALUES_IMPL_REGISTRY['lookup']
+    LookupImpl._read_table.cache_clear()
+    for _ in range(3):
+        result = LookupImpl.map_values(s, *args)
+        assert result[:3].tolist() == ['United States', 'Namibia', 'unknown']
+        assert pd.isna(result[3])
+    assert LookupImpl.map_string('NA', *args) == 'Namibia'
+    assert LookupImpl._read_table.cache_info().misses == 1
+
+    result = LookupImpl.map_values(pd.Series([1, 2]), *args[:3])
+    assert result.tolist() == [1, 2]
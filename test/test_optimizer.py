@@ -0,0 +1,141 @@
+import io
+
+import pandas as pd  # type: ignore
+import pytest
+
+from tnl.code_printer import print_module_code
+from tnl.lexer import Lexer
+from tnl.optimizer import optimize
+from tnl.parser import Parser
+from tnl.vm import transform
+
+
+@pytest.mark.parametrize('src,expected_src,num_notes', [
+    pytest.param(
+        '''\
+transform Test {
+    headers {
+        'a' -> upper | 'b'
+    }
+    values {
+        ['b'] -> trim | upper | 'n/a'
+        ['c'] -> add 1 | ['b'] | upper
+    }
+}
+''',
+        '''\
+transform Test {
+    headers {
+        'a' -> 'b'
+    }
+    values {
+        ['b'] -> 'n/a'
+        ['c'] -> {
+            | ['b']
+            | upper
+        }
+    }
+}
+''',
+        3,
+        id='dead_operations',
+    ),
+    pytest.param(
+        '''\
+transform Test {
+    values {
+        ['a'] -> trim
+        ['b'] -> add 1
+        ['a'] -> 'x'
+        [/c.*/] -> upper
+        ['c1'] -> 'y'
+        ['c2'] -> upper
+        [/c.*/] -> 'z'
+    }
+}
+''',
+        '''\
+transform Test {
+    values {
+        ['b'] -> add 1
+        ['a'] -> 'x'
+        [/c.*/] -> upper
+        [/c.*/] -> 'z'
+    }
+}
+''',
+        3,
+        id='dead_rules',
+    ),
+    pytest.param(
+        '''\
+transform Test {
+    values {
+        ['a'] -> trim
+        ['b'] -> ['a']
+        ['a'] -> 'x'
+        ['c'] -> add 1
+        ['c'] -> upper
+        ['c'] -> 'z'
+        [/d.*/] -> upper
+        ['d1'] -> 'y'
+        ['e'] -> upper
+        ['f'] -> concat ['e'] 'x'
+        ['e'] -> 'x'
+    }
+}
+''',
+        '''\
+transform Test {
+    values {
+        ['a'] -> trim
+        ['b'] -> ['a']
+        ['a'] -> 'x'
+        ['c'] -> add 1
+        ['c'] -> 'z'
+        [/d.*/] -> upper
+        ['d1'] -> 'y'
+        ['e'] -> upper
+        ['f'] -> concat ['e'] 'x'
+        ['e'] -> 'x'
+    }
+}
+''',
+        1,
+        id='live_rules',
+    ),
+])
+def test_optimize(capsys, src, expected_src, num_notes):
+    tokens = Lexer(src, 'test').lex()
+    ast = Parser(tokens, 'test').parse()
+
+    notes = optimize(ast)
+    print_module_code(ast)
+
+    assert capsys.readouterr().out == expected_src
+    assert len(notes) == num_notes
+
+
+def test_optimize_keeps_results():
+    src = '''\
+transform Test {
+    values {
+        ['a'] -> add 1
+        ['b'] -> mult ['a'] | add 1
+        ['a'] -> 7
+        [/c.*/] -> trim
+        ['c1'] -> upper | 'x'
+        [/c.*/] -> concat ['c2'] '!'
+    }
+}
+'''
+    data_str = 'a,b,c1,c2\n1,2, p , q \n3,4,r,s\n'
+    results = []
+    for optimized in (False, True):
+        tokens = Lexer(src, 'test').lex()
+        ast = Parser(tokens, 'test').parse()
+        if optimized:
+            assert optimize(ast)
+        data = pd.read_csv(io.StringIO(data_str))
+        results.append(transform(ast, data))
+    pd.testing.assert_frame_equal(results[0], results[1])
@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd  # type: ignore
+import pytest
+
+from test.utils import parse_src
+from tnl.parallel import ParallelTransform
+from tnl.parallel import shard_bounds
+from tnl.parallel import transform_parallel
+from tnl.vm import transform
+
+
+SRC = '''\
+transform Test {
+    headers {
+        'a' -> 'id'
+    }
+    values {
+        ['id'] -> auto_inc
+        ['b'] -> add 1 | max ['b'] 50
+        ['c'] -> trim | upper
+    }
+}
+'''
+
+
+@pytest.mark.parametrize('num_rows,num_shards,expected', [
+    pytest.param(10, 3, [(0, 4), (4, 7), (7, 10)], id='uneven'),
+    pytest.param(2, 4, [(0, 1), (1, 2)], id='more_shards_than_rows'),
+    pytest.param(0, 4, [(0, 0)], id='no_rows'),
+])
+def test_shard_bounds(num_rows, num_shards, expected):
+    assert shard_bounds(num_rows, num_shards) == expected
+
+
+def test_transform_parallel_matches_transform():
+    ast = parse_src(SRC)
+    data = pd.DataFrame({
+        'a': np.arange(101) * 7,
+        'b': np.arange(101, dtype=float),
+        'c': [f' row {i} ' for i in range(101)],
+    }, index=np.arange(101) + 1000)
+    expected = transform(ast, data.copy())
+    result = transform_parallel(ast, data, jobs=4)
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def test_parallel_transform_offsets_auto_inc_by_row_offset():
+    ast = parse_src(SRC)
+    data = pd.DataFrame({'a': [0] * 5, 'b': [1] * 5, 'c': ['x'] * 5})
+    with ParallelTransform(ast, jobs=2) as parallel_transform:
+        result = parallel_transform(data, row_offset=10)
+    assert result['id'].tolist() == [11, 12, 13, 14, 15]
+
+
+def test_transform_parallel_with_missing_shard():
+    # the second shard of `s` has only missing values
+    ast = parse_src('''\
+transform Test {
+    values {
+        ['s'] -> trim | upper
+        ['s'] -> lower
+    }
+}
+''')
+    data = pd.DataFrame({'s': ['a', 'b', None, None]}, dtype='str')
+    expected = transform(ast, data.copy())
+    result = transform_parallel(ast, data, jobs=2)
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def test_parallel_transform_totals_worker_memo_stats():
+    ast = parse_src(SRC)
+    data = pd.DataFrame({'a': [0] * 8, 'b': [1] * 8, 'c': ['x', 'y'] * 4})
+    with ParallelTransform(ast, jobs=2, memo_size=4) as parallel_transform:
+        parallel_transform(data)
+        parallel_transform(data)
+        stats = parallel_transform.memo_stats()
+    assert stats.hits + stats.misses == 16
+    assert stats.misses <= 4
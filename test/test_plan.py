@@ -0,0 +1,257 @@
+import pickle
+
+import numpy as np
+import pandas as pd  # type: ignore
+import pytest
+
+from test.utils import compile_src
+from test.utils import parse_src
+from tnl.map_impls import MultiReplaceImpl
+from tnl.plan import compile_plan
+from tnl.plan import FusedStringOp
+from tnl.plan import load_plan
+from tnl.plan import MapOp
+from tnl.plan import ValueStep
+from tnl.vm import transform
+
+
+def test_plan_fuses_consecutive_string_maps() -> None:
+    plan = compile_src('''\
+transform Test {
+    values {
+        ['a'] -> trim | upper | add 1 | replace 'A' 'B' | remove_prefix 'B'
+        ['b'] -> trim
+    }
+}
+''')
+    step_a, step_b = plan.steps
+    assert isinstance(step_a, ValueStep)
+    assert [type(op) for op in step_a.ops] == [FusedStringOp, MapOp, FusedStringOp]
+    assert [op.name for op in step_a.ops[0].ops] == ['trim', 'upper']
+    assert isinstance(step_b, ValueStep)
+    assert [type(op) for op in step_b.ops] == [MapOp]
+
+
+def test_fused_string_maps_keep_missing_values() -> None:
+    plan = compile_src('''\
+transform Test {
+    values {
+        ['a'] -> trim | title | replace_last ' ' '_'
+    }
+}
+''')
+    data = pd.DataFrame({'a': [' hello big world ', np.nan, 'x']})
+    transformed_data = transform(plan, data)
+    assert transformed_data['a'].tolist()[0] == 'Hello Big_World'
+    assert pd.isna(transformed_data['a'].tolist()[1])
+    assert transformed_data['a'].tolist()[2] == 'X'
+
+
+def test_fused_string_maps_fall_back_for_non_string_columns() -> None:
+    plan = compile_src('''\
+transform Test {
+    values {
+        ['a'] -> trim | upper
+    }
+}
+''')
+    assert isinstance(plan.steps[0].ops[0], FusedStringOp)
+    data = pd.DataFrame({'a': pd.Series([' x ', 1, None], dtype=object)})
+    transformed_data = transform(plan, data)
+    assert transformed_data['a'].tolist()[0] == 'X'
+    assert pd.isna(transformed_data['a'].tolist()[1])
+
+
+@pytest.mark.parametrize('pipeline', [
+    pytest.param("format '<{}>'", id='format'),
+    pytest.param("format '<{}>' | upper", id='format_then_upper'),
+    pytest.param("trim | format '<{}>' | upper", id='format_between'),
+    pytest.param("concat 'p' 'q'", id='literal_concat'),
+    pytest.param("trim | concat 'p' 'q'", id='trim_then_literal_concat'),
+    pytest.param("trim | upper | replace 'X' 'y'", id='str_methods'),
+])
+def test_fused_string_maps_match_unfused_on_missing_values(
+    pipeline: str,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    src = f'''\
+transform Test {{
+    values {{
+        ['a'] -> {pipeline}
+    }}
+}}
+'''
+    data = pd.DataFrame({'a': [' x ', None, np.nan, 'yx']})
+    transformed_data = transform(compile_src(src), data.copy())
+    monkeypatch.setattr(
+        'tnl.plan.PlanCompiler.fuse_string_ops',
+        lambda self, ops: ops,
+    )
+    expected = transform(compile_src(src), data.copy())
+    pd.testing.assert_frame_equal(transformed_data, expected)
+
+
+def test_load_plan_caches_plan_on_module() -> None:
+    ast = parse_src('''\
+transform Test {
+    headers {
+        'a' -> upper | replace 'A' 'B'
+    }
+    values {
+        ['B'] -> 'x' | upper | concat 'y' 'z'
+    }
+}
+''')
+    plan = load_plan(ast)
+    assert load_plan(ast) is plan
+
+    header_step, value_step = plan.steps
+    assert header_step.rules[0].pipeline('a') == 'B'
+    data = pd.DataFrame({'B': ['p', 'q']})
+    constant = value_step.pipeline(data['B'], data, 0)
+    assert constant.value == 'yz'
+
+    unpickled_ast = pickle.loads(pickle.dumps(ast))
+    assert unpickled_ast.plan is None
+    transformed_data = transform(unpickled_ast, pd.DataFrame({'a': ['p']}))
+    assert transformed_data['B'].tolist() == ['yz']
+
+
+def test_memoized_string_maps_match_unmemoized() -> None:
+    src = '''\
+transform Test {
+    values {
+        ['a'] -> trim | upper
+        ['b'] -> lower
+    }
+}
+'''
+    data = pd.DataFrame({
+        'a': [' x', 'y ', ' x', ' x', 'z', None, 'y '],
+        'b': ['P', 'Q', 'P', 'P', 'Q', 'P', 'R'],
+    })
+    plan = compile_src(src)
+    memo_plan = compile_plan(parse_src(src), memo_size=2)
+    assert isinstance(memo_plan.steps[0].ops[0], FusedStringOp)
+    assert isinstance(memo_plan.steps[1].ops[0], FusedStringOp)
+
+    expected = transform(plan, data.copy())
+    transformed_data = transform(memo_plan, data.copy())
+    pd.testing.assert_frame_equal(transformed_data, expected)
+
+    stats = memo_plan.memo_stats()
+    assert stats.hits > 0
+    # missing values never reach the string maps
+    assert stats.hits + stats.misses == 13
+    assert stats.size <= 4
+
+
+def test_memoized_format_caches_strings() -> None:
+    src = '''\
+transform Test {
+    values {
+        ['a'] -> format '<{}>'
+    }
+}
+'''
+    data = pd.DataFrame({'a': ['x', 'y', 'x', None, 'x', np.nan]})
+    memo_plan = compile_plan(parse_src(src), memo_size=2)
+    assert isinstance(memo_plan.steps[0].ops[0], FusedStringOp)
+
+    expected = transform(compile_src(src), data.copy())
+    transformed_data = transform(memo_plan, data.copy())
+    pd.testing.assert_frame_equal(transformed_data, expected)
+
+    stats = memo_plan.memo_stats()
+    # missing values are formatted without the cache
+    assert (stats.hits, stats.misses, stats.size) == (2, 2, 2)
+
+
+@pytest.mark.parametrize('pipeline', [
+    pytest.param("format '<{}>'", id='format'),
+    pytest.param("format '{:>3}'", id='format_spec'),
+    pytest.param("format '<{}>' | format '{}>'", id='two_formats'),
+    pytest.param("concat 'p' 'q'", id='literal_concat'),
+    pytest.param('upper', id='single_map'),
+    pytest.param("trim | format '<{}>' | upper", id='format_between'),
+    pytest.param("replace_last 'x' 'y' | concat 'p' 'q'", id='then_concat'),
+])
+def test_memoized_string_maps_match_unmemoized_on_missing_values(
+    pipeline: str,
+) -> None:
+    src = f'''\
+transform Test {{
+    values {{
+        ['a'] -> {pipeline}
+    }}
+}}
+'''
+    data = pd.DataFrame({'a': [' x ', None, 'x', np.nan, ' x ']})
+    expected = transform(compile_src(src), data.copy())
+    memo_plan = compile_plan(parse_src(src), memo_size=2)
+    transformed_data = transform(memo_plan, data.copy())
+    pd.testing.assert_frame_equal(transformed_data, expected)
+
+
+@pytest.mark.parametrize('replaces, group_sizes', [
+    pytest.param(
+        [('Co.', 'Company'), ('Ltd', 'Limited'), (';', ',')],
+        [3],
+        id='independent',
+    ),
+    pytest.param(
+        [(' ', '_'), ('__', '_'), ('-', '_')],
+        [1, 2],
+        id='replacement-creates-pattern',
+    ),
+    pytest.param(
+        [('-', ''), ('ab', 'X'), ('c', 'd')],
+        [1, 2],
+        id='deletion-joins-pattern',
+    ),
+    pytest.param(
+        [('bc', 'X'), ('ab', 'Y'), ('z', 'y')],
+        [1, 2],
+        id='patterns-overlap',
+    ),
+    pytest.param(
+        [('a', 'b'), ('a', 'c')],
+        [1, 1],
+        id='same-pattern',
+    ),
+])
+def test_replace_chains_match_sequential_replaces(
+    replaces: list,
+    group_sizes: list,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr('tnl.plan.MIN_MERGED_REPLACES', 2)
+    pipeline = ' | '.join(f"replace '{a}' '{b}'" for a, b in replaces)
+    plan = compile_src(f'''\
+transform Test {{
+    values {{
+        ['a'] -> {pipeline}
+    }}
+}}
+''')
+    step, = plan.steps
+    assert isinstance(step, ValueStep)
+    op, = step.ops
+    map_ops = op.ops if isinstance(op, FusedStringOp) else [op]
+    assert [len(map_op.args) // 2 for map_op in map_ops] == group_sizes
+    assert all(
+        (map_op.impl is MultiReplaceImpl) == (len(map_op.args) > 2)
+        for map_op in map_ops
+    )
+    values = [
+        'Acme Co. Ltd;', 'a  b--c', 'a-b-c', 'abc', 'aaa', '', 'x; Co.',
+    ]
+    expected = []
+    for value in values:
+        for a, b in replaces:
+            value = value.replace(a, b)
+        expected.append(value)
+    data = pd.DataFrame({'a': [*values, np.nan]})
+    transformed_data = transform(plan, data)
+    assert transformed_data['a'].tolist()[:-1] == expected
+    assert pd.isna(transformed_data['a'].tolist()[-1])
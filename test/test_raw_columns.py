@@ -0,0 +1,216 @@
+import io
+from functools import partial
+
+import pandas as pd  # type: ignore
+import pytest
+
+from test.utils import compile_src
+from test.utils import parse_src
+from tnl.batch import transform_files
+from tnl.cli import exec_cli
+from tnl.parallel import transform_files_parallel
+from tnl.plan import compile_plan
+from tnl.raw_columns import resolve_columns
+from tnl.raw_columns import transform_csv
+from tnl.raw_columns import transform_touched_columns
+from tnl.vm import transform
+
+
+SRC = '''\
+transform Test {
+    headers {
+        'a' -> 'id'
+        /x.*/ -> upper
+    }
+    values {
+        ['id'] -> add 1
+        [/X.*/] -> concat ['b'] '!'
+    }
+    headers {
+        'c' -> 'cc'
+    }
+    values {
+        ['cc'] -> 'seen'
+    }
+}
+'''
+
+DATA_STR = '''\
+a,b,c,d,x1,e
+1,b1,NA,1.50,p,
+2,b2,3,NA,q,1e3
+'''
+
+
+@pytest.mark.parametrize('src, names, labels, touched', [
+    pytest.param(
+        SRC,
+        ['a', 'b', 'c', 'd', 'x1', 'e'],
+        ['id', 'b', 'cc', 'd', 'X1', 'e'],
+        {0, 1, 2, 4},
+        id='src',
+    ),
+    pytest.param(SRC, ['d', 'e'], ['d', 'e'], set(), id='untouched'),
+    pytest.param(
+        '''\
+transform Test {
+    headers {
+        'a' -> 'b'
+    }
+    values {
+        ['b'] -> trim
+    }
+}
+''',
+        ['a', 'b'],
+        ['b', 'b'],
+        {0, 1},
+        id='renamed_onto_another_column',
+    ),
+])
+def test_resolve_columns(src, names, labels, touched) -> None:
+    assert resolve_columns(compile_src(src), names) == (labels, touched)
+
+
+def test_untouched_columns_are_carried_through(tmp_path) -> None:
+    plan = compile_src(SRC)
+    data_file = tmp_path / 'data.csv'
+    data_file.write_text(DATA_STR)
+    transform_data = partial(transform, plan)
+    output = transform_csv(transform_data, str(data_file), plan)
+    assert output == (
+        'id,b,cc,d,X1,e\n'
+        '2,b1,seen,1.50,b1!,\n'
+        '3,b2,seen,NA,b2!,1e3\n'
+    )
+    result = pd.read_csv(io.StringIO(output))
+    expected = transform(plan, pd.read_csv(str(data_file)))
+    pd.testing.assert_frame_equal(result, expected)
+
+
+@pytest.mark.parametrize('data_str', [
+    pytest.param('a,b,d\n1,2,x,3\n', id='long_rows'),
+    pytest.param('a,b,d\n1,x,2\n1,x\n', id='short_row'),
+    pytest.param('a,b,d\n1,x,2\n \n', id='blank_looking_row'),
+    pytest.param('a,a,d\n1,x,2\n', id='duplicate_names'),
+])
+def test_transform_csv_falls_back(tmp_path, data_str) -> None:
+    plan = compile_src(SRC)
+    data_file = tmp_path / 'data.csv'
+    data_file.write_text(data_str)
+    transform_data = partial(transform, plan)
+    assert transform_touched_columns(transform_data, plan, str(data_file)) is None
+    assert transform_csv(transform_data, str(data_file), plan) == (
+        transform_csv(transform_data, str(data_file))
+    )
+
+
+def test_transform_csv_skips_blank_lines(tmp_path) -> None:
+    plan = compile_src(SRC)
+    data_file = tmp_path / 'data.csv'
+    data_file.write_text('a,d\n1,1.50\n\n2,2.50\n')
+    transform_data = partial(transform, plan)
+    assert transform_csv(transform_data, str(data_file), plan) == (
+        'id,d\n2,1.50\n3,2.50\n'
+    )
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_transform_file_carries_untouched_columns(tmp_path, jobs) -> None:
+    ast = parse_src(SRC)
+    plan = compile_plan(ast)
+    data_file = tmp_path / 'data.csv'
+    data_file.write_text(DATA_STR)
+    out_file = tmp_path / 'out' / 'data.csv'
+    out_file.parent.mkdir()
+    file_pairs = [(str(data_file), str(out_file))]
+    if jobs > 1:
+        transform_files_parallel(ast, file_pairs, jobs, raw_columns=True)
+    else:
+        transform_files(partial(transform, plan), file_pairs, plan=plan)
+    assert out_file.read_text() == (
+        'id,b,cc,d,X1,e\n'
+        '2,b1,seen,1.50,b1!,\n'
+        '3,b2,seen,NA,b2!,1e3\n'
+        '\n'
+    )
+
+
+def run_cli(monkeypatch, capsys, *argv: str) -> str:
+    monkeypatch.setattr('sys.argv', ['tnl', *argv])
+    assert exec_cli() == 0
+    return str(capsys.readouterr().out)
+
+
+@pytest.mark.parametrize('options', [
+    pytest.param([], id='pandas'),
+    pytest.param(['--raw-columns'], id='raw_columns'),
+])
+@pytest.mark.parametrize('src', [
+    pytest.param(SRC, id='some_columns_touched'),
+    pytest.param(
+        '''\
+transform Test {
+    values {
+        [/.*/] -> 'x'
+    }
+}
+''',
+        id='every_column_touched',
+    ),
+])
+def test_outputs_match_across_modes(
+    tmp_path,
+    monkeypatch,
+    capsys,
+    options,
+    src,
+) -> None:
+    src_file = tmp_path / 'test.tnl'
+    src_file.write_text(src)
+    data_file = tmp_path / 'data.csv'
+    data_file.write_text(DATA_STR)
+    args = [str(src_file), str(data_file), *options]
+
+    output = run_cli(monkeypatch, capsys, *args)
+    outputs = [output]
+    if not options:
+        outputs.append(run_cli(monkeypatch, capsys, *args, '--chunk-size', '1'))
+    for batch_options in [[], ['--jobs', '2']]:
+        output_dir = tmp_path / f'out{len(outputs)}'
+        run_cli(
+            monkeypatch,
+            capsys,
+            *args,
+            *batch_options,
+            '--output-dir',
+            str(output_dir),
+        )
+        outputs.append((output_dir / 'data.csv').read_text())
+    assert outputs == [output] * len(outputs)
+    expected = transform(compile_src(src), pd.read_csv(data_file))
+    pandas_output = expected.to_csv(index=False) + '\n'
+    if options and src == SRC:
+        # `d` is untouched, so its text is carried through
+        assert '1.50' in output
+    else:
+        assert output == pandas_output
+
+
+def test_raw_columns_cannot_stream(tmp_path, monkeypatch, capsys) -> None:
+    src_file = tmp_path / 'test.tnl'
+    src_file.write_text(SRC)
+    data_file = tmp_path / 'data.csv'
+    data_file.write_text(DATA_STR)
+    monkeypatch.setattr('sys.argv', [
+        'tnl',
+        str(src_file),
+        str(data_file),
+        '--raw-columns',
+        '--chunk-size',
+        '1',
+    ])
+    assert exec_cli() == 1
+    assert capsys.readouterr().out == (
+        '--raw-columns can\'t be used with --chunk-size.\n'
+    )
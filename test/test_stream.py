@@ -0,0 +1,101 @@
+import io
+from functools import partial
+
+import pandas as pd  # type: ignore
+import pytest
+
+from test.utils import compile_src
+from tnl.stream import transform_csv_chunks
+from tnl.vm import transform
+
+
+SRC = '''\
+transform Test {
+    headers {
+        'a' -> 'id'
+    }
+    values {
+        ['id'] -> auto_inc
+        ['b'] -> add 1
+        ['c'] -> trim | upper
+    }
+}
+'''
+
+
+@pytest.mark.parametrize('data_str', [
+    pytest.param(
+        'a,b,c,d\n'
+        'x,1, hello ,True\n'
+        'y,2,world,False\n'
+        'z,3,  foo,True\n'
+        'w,4,bar ,False\n'
+        'v,5,baz,True\n',
+        id='same_dtypes',
+    ),
+    pytest.param(
+        'a,b,c,d\n'
+        'x,1, hello ,True\n'
+        'y,2,world,False\n'
+        'z,,  foo,\n'
+        'w,4,,False\n'
+        'v,5.5,baz,True\n',
+        id='missing_values_in_later_chunks',
+    ),
+    pytest.param(
+        'a,b,c,d\n'
+        'x,1,1.50,1\n'
+        'y,2,2.0,2\n'
+        'z,3,abc,x\n'
+        'w,4,,False\n'
+        'v,5,7,1.0\n',
+        id='strings_in_later_chunks',
+    ),
+    pytest.param(
+        'a,b,c,d\n',
+        id='no_rows',
+    ),
+])
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 100])
+def test_transform_csv_chunks_matches_whole_file(
+    tmp_path,
+    data_str: str,
+    chunk_size: int,
+) -> None:
+    data_file = tmp_path / 'data.csv'
+    data_file.write_text(data_str)
+    plan = compile_src(SRC)
+
+    expected = transform(plan, pd.read_csv(data_file)).to_csv(index=False)
+    out = io.StringIO()
+    transform_chunk = partial(transform, plan)
+    transform_csv_chunks(transform_chunk, str(data_file), out, chunk_size)
+    assert out.getvalue() == expected + '\n'
+
+
+@pytest.mark.parametrize('pipeline', [
+    pytest.param('trim | upper', id='fused'),
+    pytest.param("replace_last 'a' 'b'", id='replace_last'),
+    pytest.param(
+        ' | '.join(f"replace '{c}' '{c.upper()}'" for c in 'abcdefghijklmnop'),
+        id='merged_replaces',
+    ),
+])
+def test_transform_csv_chunks_with_missing_chunk(tmp_path, pipeline) -> None:
+    # the second chunk of `s` has only missing values, which a later
+    # string rule must still be able to use as strings
+    data_file = tmp_path / 'data.csv'
+    data_file.write_text('s,n\na,1\nb,2\n,3\n,4\n')
+    plan = compile_src(f'''\
+transform Test {{
+    values {{
+        ['s'] -> {pipeline}
+        ['s'] -> upper
+    }}
+}}
+''')
+
+    expected = transform(plan, pd.read_csv(data_file)).to_csv(index=False)
+    out = io.StringIO()
+    transform_csv_chunks(partial(transform, plan), str(data_file), out, 2)
+    assert out.getvalue() == expected + '\n'
@@ -0,0 +1,14 @@
+from tnl.ast import Module
+from tnl.lexer import Lexer
+from tnl.parser import Parser
+from tnl.plan import compile_plan
+from tnl.plan import Plan
+
+
+def parse_src(src: str) -> Module:
+    tokens = Lexer(src, 'test').lex()
+    return Parser(tokens, 'test').parse()
+
+
+def compile_src(src: str) -> Plan:
+    return compile_plan(parse_src(src))
@@ -1,4 +1,6 @@
 import warnings
 
+__version__ = '0.1.0'
+
 # ignore pandas lzma warning
 warnings.simplefilter(action='ignore', category=UserWarning)
@@ -1,4 +1,6 @@
 import re
+from typing import Any
+from typing import Dict
 from typing import Literal as TypeLiteral
 from typing import List
 from typing import Optional
@@ -15,15 +17,27 @@ BinaryOpOp = TypeLiteral['*', '/', '%', '+', '-']  # noqa F722
 
 
 class ASTNode:
-    pass
+    # Nodes declare `__slots__` instead of having a `__dict__`, since
+    # generated programs can have millions of them (tokens are tuples).
+    __slots__ = ()
 
 
 class Module(ASTNode):
+    __slots__ = ('definitions', 'plan')
+
     def __init__(self, definitions: List[Definition]) -> None:
         self.definitions = definitions
+        # the compiled plan, cached by `tnl.plan.load_plan`
+        self.plan: Optional[Any] = None
+
+    def __getstate__(self) -> Tuple[None, Dict[str, Any]]:
+        # plans hold generated functions, which can't be pickled
+        return None, {'definitions': self.definitions, 'plan': None}
 
 
 class Transform(ASTNode):
+    __slots__ = ('name', 'rule_blocks')
+
     def __init__(self, name: 'Name', rule_blocks: List[RuleBlock]) -> None:
         self.name = name
         self.rule_blocks = rule_blocks
@@ -31,56 +45,72 @@ class Transform(ASTNode):
 
 class Test(ASTNode):
     # TODO
-    pass
+    __slots__ = ()
 
 
 class AliasBlock(ASTNode):
+    __slots__ = ('alias_rules',)
+
     def __init__(self, alias_rules: List['AliasRule']) -> None:
         self.alias_rules = alias_rules
 
 
 class HeaderBlock(ASTNode):
+    __slots__ = ('header_rules',)
+
     def __init__(self, header_rules: List['HeaderRule']) -> None:
         self.header_rules = header_rules
 
 
 class ValueBlock(ASTNode):
+    __slots__ = ('value_rules',)
+
     def __init__(self, value_rules: List['ValueRule']) -> None:
         self.value_rules = value_rules
 
 
 class AliasRule(ASTNode):
+    __slots__ = ('name', 'value')
+
     def __init__(self, name: 'Name', value: 'Literal') -> None:
         self.name = name
         self.value = value
 
 
 class HeaderRule(ASTNode):
+    __slots__ = ('header', 'pipeline')
+
     def __init__(self, header: Header, pipeline: 'Pipeline') -> None:
         self.header = header
         self.pipeline = pipeline
 
 
 class ValueRule(ASTNode):
+    __slots__ = ('rvalue', 'pipeline')
+
     def __init__(self, rvalue: 'RValue', pipeline: 'Pipeline') -> None:
         self.rvalue = rvalue
         self.pipeline = pipeline
 
 
 class Pipeline(ASTNode):
+    __slots__ = ('operations',)
+
     def __init__(self, operations: List['Operation']) -> None:
         self.operations = operations
 
 
 class Operation(ASTNode):
-    pass
+    __slots__ = ()
 
 
 class Expr(Operation):
-    pass
+    __slots__ = ()
 
 
 class BinaryOp(Expr):
+    __slots__ = ('op', 'left', 'right')
+
     def __init__(self, op: BinaryOpOp, left: Expr, right: Expr) -> None:
         self.op = op
         self.left = left
@@ -88,6 +118,8 @@ class BinaryOp(Expr):
 
 
 class UnaryOp(Expr):
+    __slots__ = ('op', 'expr')
+
     def __init__(self, op: UnaryOpOp, expr: Expr) -> None:
         self.op = op
         self.expr = expr
@@ -96,6 +128,8 @@ class UnaryOp(Expr):
 # TODO: make something like LogicalOp for easier semantic analysis
 #       the negation, unary_op vs binary_op might be interesting
 class Conditional(Operation):
+    __slots__ = ('test', 'true_pipeline', 'false_pipeline')
+
     def __init__(
         self,
         test: Expr,
@@ -108,40 +142,52 @@ class Conditional(Operation):
 
 
 class Map(Operation):
+    __slots__ = ('name', 'args')
+
     def __init__(self, name: 'Name', args: Tuple['RValue', ...]) -> None:
         self.name = name
         self.args = args
 
 
 class RValue(Expr):
-    pass
+    __slots__ = ()
 
 
 class ColumnSelector(RValue):
+    __slots__ = ('header',)
+
     def __init__(self, header: Header) -> None:
         self.header = header
 
 
 class Name(RValue):
+    __slots__ = ('data',)
+
     def __init__(self, data: str) -> None:
         self.data = data
 
 
 class Literal(RValue):
-    pass
+    __slots__ = ()
 
 
 class String(Literal):
+    __slots__ = ('data',)
+
     def __init__(self, data: str) -> None:
         self.data = data
 
 
 class Number(Literal):
+    __slots__ = ('data',)
+
     def __init__(self, data: int) -> None:
         self.data = data
 
 
 class Pattern(Literal):
+    __slots__ = ('data', '_compiled_pattern')
+
     def __init__(self, data: str) -> None:
         self.data = data
         self._compiled_pattern: Optional[re.Pattern[str]] = None
@@ -153,5 +199,7 @@ class Pattern(Literal):
 
 
 class Boolean(Literal):
+    __slots__ = ('data',)
+
     def __init__(self, data: bool) -> None:
         self.data = data
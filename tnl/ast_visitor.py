@@ -1,3 +1,7 @@
+from typing import Any
+from typing import Callable
+from typing import Dict
+
 from tnl.ast import ASTNode
 from tnl.ast import Module
 from tnl.ast import Transform
@@ -22,11 +26,22 @@ from tnl.ast import Boolean
 
 
 class ASTVisitor:
+    # the `visit_<node class name>` method for each node class, looked up
+    # once per visitor class
+    visit_methods: Dict[type, Callable[[Any, Any], None]] = {}
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        cls.visit_methods = {}
 
     def visit(self, node: ASTNode) -> None:
-        node_type = node.__class__.__name__
-        node_visit = f'visit_{node_type}'
-        getattr(self, node_visit)(node)
+        node_class = node.__class__
+        try:
+            node_visit = self.visit_methods[node_class]
+        except KeyError:
+            node_visit = getattr(type(self), f'visit_{node_class.__name__}')
+            self.visit_methods[node_class] = node_visit
+        node_visit(self, node)
 
     def visit_Module(self, node: Module) -> None:
         for definition in node.definitions:
@@ -0,0 +1,54 @@
+import glob
+import os
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from tnl.plan import Plan
+from tnl.raw_columns import transform_csv
+from tnl.stream import ChunkTransform
+from tnl.stream import transform_csv_chunks
+
+
+# Batch mode transforms many data files with one compiled program, so
+# interpreter start up, imports and compiling the program are paid once
+# rather than once per file. Each data file is written to a file of the
+# same name in the output directory.
+
+def expand_data_file(data_file: str) -> List[str]:
+    # the csv files of a directory, the files matching a glob or the file
+    if os.path.isdir(data_file):
+        return sorted(glob.glob(os.path.join(glob.escape(data_file), '*.csv')))
+    if any(c in data_file for c in '*?['):
+        return sorted(glob.glob(data_file))
+    return [data_file]
+
+
+def output_file(data_file: str, output_dir: str) -> str:
+    return os.path.join(output_dir, os.path.basename(data_file))
+
+
+def transform_file(
+    transform_data: ChunkTransform,
+    data_file: str,
+    out_file: str,
+    chunk_size: Optional[int] = None,
+    plan: Optional[Plan] = None,
+) -> None:
+    # `plan` is the plan of `transform_data`, see `tnl.raw_columns`
+    with open(out_file, 'w') as out:
+        if chunk_size is not None:
+            transform_csv_chunks(transform_data, data_file, out, chunk_size)
+            return
+        # matches what `tnl` prints for a single data file
+        out.write(transform_csv(transform_data, data_file, plan) + '\n')
+
+
+def transform_files(
+    transform_data: ChunkTransform,
+    file_pairs: List[Tuple[str, str]],
+    chunk_size: Optional[int] = None,
+    plan: Optional[Plan] = None,
+) -> None:
+    for data_file, out_file in file_pairs:
+        transform_file(transform_data, data_file, out_file, chunk_size, plan)
@@ -0,0 +1,107 @@
+import hashlib
+import os
+import pickle
+import sys
+import tempfile
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+import tnl
+from tnl.ast import Map
+from tnl.ast import Module
+from tnl.ast_visitor import ASTVisitor
+from tnl.semantic_analyzer import check_lookup
+
+
+# Caches the front end's work on disk: the analyzed and optimized AST of a
+# program (with the optimizer's notes), keyed by a hash of its source. The
+# key also covers the tnl and python versions, since either can change the
+# AST classes or what the front end makes of a source. Only programs
+# without errors are cached.
+#
+# A program also depends on the lookup tables it names, so an entry keeps
+# its `lookup` maps and is a miss when their tables no longer check out
+# (the program is then compiled again, and the errors reported as usual).
+#
+# Entries are pickles, and unpickling runs code, so the cache directory is
+# created readable and writable by its owner only, and a directory that
+# someone else owns or can write to is never read from or written to.
+
+CachedProgram = Tuple[Module, List[str]]
+
+CACHE_DIR_ENV = 'TNL_CACHE_DIR'
+
+
+def cache_key(src: str) -> str:
+    key = hashlib.sha256()
+    for part in [tnl.__version__, sys.version, src]:
+        key.update(part.encode())
+        key.update(b'\0')
+    return key.hexdigest()
+
+
+class LookupCollector(ASTVisitor):
+    def __init__(self) -> None:
+        self.lookups: List[Map] = []
+
+    def visit_Map(self, node: Map) -> None:
+        if node.name.data == 'lookup':
+            self.lookups.append(node)
+        super().visit_Map(node)
+
+
+def is_private_dir(cache_dir: str) -> bool:
+    # False for a directory anyone but its owner, the current user, can
+    # write to or read from
+    try:
+        st = os.stat(cache_dir)
+    except OSError:
+        return False
+    if not hasattr(os, 'getuid'):
+        return True
+    return st.st_uid == os.getuid() and st.st_mode & 0o077 == 0
+
+
+def cache_file(cache_dir: str, src: str) -> str:
+    return os.path.join(cache_dir, f'{cache_key(src)}.pickle')
+
+
+def load_cached_program(cache_dir: str, src: str) -> Optional[CachedProgram]:
+    if not is_private_dir(cache_dir):
+        return None
+    try:
+        with open(cache_file(cache_dir, src), 'rb') as fp:
+            ast, notes, lookups = pickle.load(fp)
+    except Exception:
+        # a missing, truncated or otherwise unreadable entry is a miss; it
+        # is replaced once the program is compiled again
+        return None
+    if not isinstance(ast, Module):
+        return None
+    if any(check_lookup(lookup) for lookup in lookups):
+        return None
+    return ast, notes
+
+
+def store_cached_program(
+    cache_dir: str,
+    src: str,
+    program: CachedProgram,
+) -> None:
+    os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+    if not is_private_dir(cache_dir):
+        return
+    collector = LookupCollector()
+    collector.visit(program[0])
+    entry = (*program, collector.lookups)
+    # written to a temporary file and renamed, so concurrent runs never
+    # read a partly written entry
+    fd, tmp_file = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as fp:
+            pickle.dump(entry, fp, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, cache_file(cache_dir, src))
+    except BaseException:
+        os.unlink(tmp_file)
+        raise
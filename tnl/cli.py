@@ -1,15 +1,27 @@
 import argparse
 import os
+import sys
+from functools import partial
+from typing import Dict
+from typing import List
 
-import pandas as pd  # type: ignore
-
+from tnl.ast import Module
+from tnl.cache import CACHE_DIR_ENV
+from tnl.cache import is_private_dir
+from tnl.cache import load_cached_program
+from tnl.cache import store_cached_program
+from tnl.gc_pause import paused_gc
 from tnl.lexer import Lexer
 from tnl.parser import Parser
 from tnl.semantic_analyzer import analyze
-from tnl.vm import transform
+from tnl.optimizer import optimize
 from tnl.ast_printer import print_module_ast
 from tnl.code_printer import print_module_code
 
+# Everything that touches data (and so pandas) is imported where it's
+# used, so commands that stop at the front end (`--print-*`, `--check`)
+# don't pay for importing pandas.
+
 
 def exec_cli() -> int:
     argparser = argparse.ArgumentParser(
@@ -25,7 +37,11 @@ def exec_cli() -> int:
     argparser.add_argument(
         'data_file',
         type=str,
-        help='A data file containing data to transform.',
+        nargs='+',
+        help=(
+            'A data file containing data to transform. With --output-dir, '
+            'any number of data files, globs or directories of csv files.'
+        ),
     )
 
     stage_group = argparser.add_mutually_exclusive_group(required=False)
@@ -41,6 +57,67 @@ def exec_cli() -> int:
     stage_group.add_argument('--compile', dest='target')
     stage_group.add_argument('--interpret', action='store_const', const=True)
 
+    argparser.add_argument(
+        '--chunk-size',
+        type=int,
+        metavar='N',
+        help='Stream the data file through the transform N rows at a time.',
+    )
+    argparser.add_argument(
+        '--jobs',
+        type=int,
+        default=1,
+        metavar='N',
+        help='Transform row shards of the data in N worker processes.',
+    )
+    argparser.add_argument(
+        '--threads',
+        type=int,
+        default=1,
+        metavar='N',
+        help='Run independent value rules on N threads.',
+    )
+    argparser.add_argument(
+        '--raw-columns',
+        action='store_const',
+        const=True,
+        help=(
+            'Read only the columns value rules touch, and copy the other '
+            'columns into the output as they are in the data file.'
+        ),
+    )
+    argparser.add_argument(
+        '--verbose',
+        action='store_const',
+        const=True,
+        help=(
+            'Report the work the optimizer removed (and memo stats) on '
+            'stderr.'
+        ),
+    )
+    argparser.add_argument(
+        '--memo-size',
+        type=int,
+        metavar='N',
+        help='Remember the results of string maps for the last N values.',
+    )
+    argparser.add_argument(
+        '--cache-dir',
+        metavar='DIR',
+        help=(
+            'Cache analyzed programs in DIR, keyed by their source, and '
+            f'reuse them on later runs. Defaults to ${CACHE_DIR_ENV}.'
+        ),
+    )
+    argparser.add_argument(
+        '--output-dir',
+        metavar='DIR',
+        help=(
+            'Transform every data file, writing each to a file of the same '
+            'name in DIR. With --jobs, files are transformed in parallel.'
+        ),
+    )
+
     args = argparser.parse_args()
 
     if not os.path.exists(args.source_file):
@@ -50,53 +127,259 @@ def exec_cli() -> int:
     with open(args.source_file, 'r') as fp:
         src = fp.read()
 
-    lexer = Lexer(src, args.source_file)
-    tokens = lexer.lex()
+    cache_dir = args.cache_dir or os.environ.get(CACHE_DIR_ENV)
+    if cache_dir and os.path.exists(cache_dir) and not is_private_dir(cache_dir):
+        print(
+            f'Not using cache dir {cache_dir}: only you should be able to '
+            'access it.',
+            file=sys.stderr,
+        )
+        cache_dir = None
+    prints_front_end = args.print_tokens or args.print_ast or args.print_code
+    cached_program = None
+    if cache_dir and not prints_front_end:
+        cached_program = load_cached_program(cache_dir, src)
 
-    if args.print_tokens:
-        for token in tokens:
-            print(token)
-        return 0
+    if cached_program is not None:
+        ast, optimization_notes = cached_program
+        if args.check:
+            print('Success: no issues found.')
+            return 0
+    else:
+        lexer = Lexer(src, args.source_file)
+        with paused_gc():
+            tokens = lexer.lex()
 
-    parser = Parser(tokens, args.source_file)
-    ast = parser.parse()
+        if args.print_tokens:
+            for token in tokens:
+                print(token)
+            return 0
 
-    if args.print_ast:
-        print_module_ast(ast)
-        return 0
+        parser = Parser(tokens, args.source_file)
+        with paused_gc():
+            ast = parser.parse()
 
-    if args.print_code:
-        print_module_code(ast)
-        return 0
+        if args.print_ast:
+            print_module_ast(ast)
+            return 0
+
+        if args.print_code:
+            print_module_code(ast)
+            return 0
+
+        with paused_gc():
+            semantic_errors = analyze(ast)
+        if semantic_errors:
+            for error in semantic_errors:
+                print(error)
+            if args.check:
+                return 0
+            else:
+                return 1
 
-    semantic_errors = analyze(ast)
-    if semantic_errors:
-        for error in semantic_errors:
-            print(error)
         if args.check:
+            print('Success: no issues found.')
             return 0
-        else:
+
+        optimization_notes = optimize(ast)
+        if cache_dir:
+            store_cached_program(cache_dir, src, (ast, optimization_notes))
+
+    if args.verbose:
+        for note in optimization_notes:
+            print(note, file=sys.stderr)
+
+    if args.target:
+        if args.target != 'pandas':
+            print(f'Unknown compile target {args.target}.')
             return 1
+        from tnl.codegen import generate_pandas_module
+        print(generate_pandas_module(ast, args.source_file), end='')
+        return 0
 
-    if args.check:
-        print('Success: no issues found.')
+    from tnl.batch import expand_data_file
+    from tnl.header_copy import copy_with_header
+    from tnl.header_copy import is_header_only
+    from tnl.parallel import ParallelTransform
+    from tnl.plan import compile_plan
+    from tnl.raw_columns import transform_csv
+    from tnl.stream import transform_csv_chunks
+    from tnl.vm import transform
+
+    data_files = []
+    for pattern in args.data_file:
+        matches = expand_data_file(pattern)
+        if not matches:
+            print(f'No data files match {pattern}.')
+            return 1
+        data_files.extend(matches)
+
+    for data_file in data_files:
+        if not os.path.exists(data_file):
+            print(f'Can\'t find data_file {data_file}.')
+            return 1
+
+    if args.jobs < 1:
+        print('--jobs must be at least 1.')
+        return 1
+
+    if args.threads < 1:
+        print('--threads must be at least 1.')
+        return 1
+
+    if args.memo_size is not None and args.memo_size < 1:
+        print('--memo-size must be at least 1.')
+        return 1
+
+    if args.chunk_size is not None and args.chunk_size < 1:
+        print('--chunk-size must be at least 1.')
+        return 1
+
+    if args.raw_columns and args.chunk_size is not None:
+        print('--raw-columns can\'t be used with --chunk-size.')
+        return 1
+
+    if args.output_dir is not None:
+        return exec_batch(args, ast, data_files)
+
+    if len(data_files) > 1:
+        print('Use --output-dir to transform more than one data file.')
+        return 1
+    data_file = data_files[0]
+
+    plan = compile_plan(ast, args.memo_size)
+    raw_columns_plan = plan if args.raw_columns else None
+    if is_header_only(plan):
+        sys.stdout.flush()
+        if copy_with_header(plan, data_file, sys.stdout.buffer):
+            return 0
+
+    if args.chunk_size is not None:
+        if args.jobs > 1:
+            parallel_transform = ParallelTransform(
+                ast,
+                args.jobs,
+                args.threads,
+                args.memo_size,
+            )
+            with parallel_transform:
+                transform_csv_chunks(
+                    parallel_transform,
+                    data_file,
+                    sys.stdout,
+                    args.chunk_size,
+                )
+            memo_stats = parallel_transform.memo_stats()
+        else:
+            transform_chunk = partial(transform, plan, workers=args.threads)
+            transform_csv_chunks(
+                transform_chunk,
+                data_file,
+                sys.stdout,
+                args.chunk_size,
+            )
+            memo_stats = plan.memo_stats()
+        if args.verbose and args.memo_size is not None:
+            print(memo_stats, file=sys.stderr)
         return 0
 
-    if not os.path.exists(args.data_file):
-        print(f'Can\'t find data_file {args.data_file}.')
+    if args.jobs > 1:
+        parallel_transform = ParallelTransform(
+            ast,
+            args.jobs,
+            args.threads,
+            args.memo_size,
+        )
+        with parallel_transform:
+            output = transform_csv(
+                parallel_transform,
+                data_file,
+                raw_columns_plan,
+            )
+        memo_stats = parallel_transform.memo_stats()
+    else:
+        transform_data = partial(transform, plan, workers=args.threads)
+        output = transform_csv(transform_data, data_file, raw_columns_plan)
+        memo_stats = plan.memo_stats()
+    print(output)
+    if args.verbose and args.memo_size is not None:
+        print(memo_stats, file=sys.stderr)
+
+    return 0
+
+
+def exec_batch(
+    args: argparse.Namespace,
+    ast: Module,
+    data_files: List[str],
+) -> int:
+    from tnl.batch import output_file
+    from tnl.batch import transform_file
+    from tnl.batch import transform_files
+    from tnl.header_copy import copy_with_header
+    from tnl.header_copy import is_header_only
+    from tnl.parallel import transform_files_parallel
+    from tnl.plan import compile_plan
+    from tnl.vm import transform
+
+    if os.path.exists(args.output_dir) and not os.path.isdir(args.output_dir):
+        print(f'output_dir {args.output_dir} is not a directory.')
         return 1
 
-    # TODO: don't necessarily assume csv in the future
-    data = pd.read_csv(args.data_file)
+    file_pairs = []
+    data_files_by_out_file: Dict[str, str] = {}
+    for data_file in data_files:
+        out_file = output_file(data_file, args.output_dir)
+        if os.path.realpath(out_file) == os.path.realpath(data_file):
+            print(f'Output for {data_file} would overwrite it.')
+            return 1
+        if out_file in data_files_by_out_file:
+            print(
+                f'Output for {data_files_by_out_file[out_file]} and '
+                f'{data_file} would both be written to {out_file}.'
+            )
+            return 1
+        data_files_by_out_file[out_file] = data_file
+        file_pairs.append((data_file, out_file))
 
-    if args.target:
-        # TODO: implement compile to pandas code
-        # if args.compile == 'pandas'  ...
-        print(args.target)
-        print('`compile` does nothing right now.')
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    plan = compile_plan(ast, args.memo_size)
+    if is_header_only(plan):
+        # copying is bound by the disk, so this doesn't use --jobs
+        transform_data = partial(transform, plan, workers=args.threads)
+        for data_file, out_file in file_pairs:
+            with open(out_file, 'wb') as out:
+                copied = copy_with_header(plan, data_file, out)
+            if not copied:
+                transform_file(
+                    transform_data,
+                    data_file,
+                    out_file,
+                    args.chunk_size,
+                )
         return 0
 
-    transformed_data = transform(ast, data)
-    print(transformed_data.to_csv(index=False))
+    if args.jobs > 1:
+        memo_stats = transform_files_parallel(
+            ast,
+            file_pairs,
+            args.jobs,
+            args.threads,
+            args.memo_size,
+            args.chunk_size,
+            bool(args.raw_columns),
+        )
+    else:
+        transform_data = partial(transform, plan, workers=args.threads)
+        transform_files(
+            transform_data,
+            file_pairs,
+            args.chunk_size,
+            plan if args.raw_columns else None,
+        )
+        memo_stats = plan.memo_stats()
+    if args.verbose and args.memo_size is not None:
+        print(memo_stats, file=sys.stderr)
 
     return 0
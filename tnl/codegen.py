@@ -0,0 +1,210 @@
+import ast as py_ast
+import inspect
+from typing import Any
+from typing import List
+from typing import Optional
+
+import tnl.constant
+import tnl.map_impls
+import tnl.plan
+from tnl.ast import Module
+from tnl.plan import HeaderStep
+from tnl.plan import load_plan
+from tnl.plan import PIPELINE_HELPERS
+from tnl.plan import PipelineCompiler
+from tnl.plan import Selector
+from tnl.plan import ValueStep
+
+
+# Generates a standalone python module (depending only on numpy and
+# pandas) that performs the same transform as running the plan of `ast`
+# in the VM. The map kernels are copied into the module from
+# `tnl/map_impls.py` and called directly, so results are identical.
+# Anything known at compile time is resolved while generating: renames of
+# named headers, and string maps applied to literals.
+
+PRELUDE = '''\
+import os
+import re
+from functools import lru_cache
+from operator import methodcaller
+from string import Formatter
+from typing import Any
+from typing import Callable
+from typing import List
+from typing import Optional
+from typing import Protocol
+from typing import Tuple
+from typing import Union
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import infer_dtype
+'''
+
+HELPERS = '''\
+def _assign(data: pd.DataFrame, col: str, s: Any) -> None:
+    if isinstance(s, Constant):
+        data[col] = s.value
+    else:
+        data[col] = s
+
+
+def _positions(labels: list) -> dict:
+    positions: dict = {}
+    for i, label in enumerate(labels):
+        positions.setdefault(label, []).append(i)
+    return positions
+
+
+def _rename(labels: list, positions: dict, from_str: str, to_str: str) -> None:
+    # relabels every column carrying `from_str`, found through `positions`
+    # (the positions of the columns carrying each label)
+    if from_str == to_str or from_str not in positions:
+        return
+    moved = positions.pop(from_str)
+    for i in moved:
+        labels[i] = to_str
+    positions.setdefault(to_str, []).extend(moved)
+'''
+
+MAIN = '''\
+if __name__ == '__main__':
+    import sys
+    print(transform(pd.read_csv(sys.argv[1])).to_csv(index=False))
+'''
+
+# top level definitions of `tnl/map_impls.py` every kernel may rely on
+MAP_IMPLS_HELPERS = [
+    '_HAS_STR_REMOVE_AFFIX',
+    '_map_elements',
+    '_reduce_operands',
+    '_lookup_values',
+    '_lookup_string',
+    '_lookup_table',
+    'MapImpl',
+]
+
+
+def generate_pandas_module(ast: Module, source_name: str) -> str:
+    generator = PandasCodeGenerator(source_name)
+    return generator.generate(ast)
+
+
+def top_level_sources(module: Any, names: Optional[List[str]]) -> List[str]:
+    # The source of a module's top level definitions and assignments
+    # (without decorators), in module order; all of them if `names` is None.
+    source = inspect.getsource(module)
+    sources = []
+    for node in py_ast.parse(source).body:
+        if isinstance(node, (py_ast.Import, py_ast.ImportFrom)):
+            continue
+        if isinstance(node, (py_ast.FunctionDef, py_ast.ClassDef)):
+            name = node.name
+        elif isinstance(node, py_ast.Assign) and len(node.targets) == 1:
+            target = node.targets[0]
+            name = target.id if isinstance(target, py_ast.Name) else ''
+        else:
+            continue
+        if names is None or name in names:
+            segment = py_ast.get_source_segment(source, node)
+            assert segment is not None
+            sources.append(segment)
+    return sources
+
+
+class PandasCodeGenerator:
+    def __init__(self, source_name: str) -> None:
+        self.source_name = source_name
+        self.pipeline_compiler = PipelineCompiler(standalone=True)
+        self.body: List[str] = []
+
+    def generate(self, ast: Module) -> str:
+        plan = load_plan(ast)
+        for step in plan.steps:
+            if isinstance(step, HeaderStep):
+                self.gen_header_step(step)
+            else:
+                self.gen_value_step(step)
+        kernel_names = list(self.pipeline_compiler.impls)
+        sections = [
+            f'# Generated by tnl from {self.source_name}.\n\n{PRELUDE}',
+            *top_level_sources(tnl.constant, None),
+            *top_level_sources(tnl.map_impls, MAP_IMPLS_HELPERS),
+            *top_level_sources(tnl.map_impls, kernel_names),
+            *top_level_sources(tnl.plan, ['holds_python_strings']),
+            PIPELINE_HELPERS,
+            HELPERS,
+            *self.pipeline_compiler.definitions,
+            '\n'.join([
+                'def transform(',
+                '    data: pd.DataFrame,',
+                '    row_offset: int = 0,',
+                ') -> pd.DataFrame:',
+                *self.body,
+                '    return data',
+            ]),
+            MAIN,
+        ]
+        sections = [section.rstrip('\n') for section in sections]
+        return '\n\n\n'.join(sections) + '\n'
+
+    def emit(self, line: str, indent: int = 1) -> None:
+        self.body.append('    ' * indent + line)
+
+    def gen_pattern(self, selector: Selector) -> str:
+        assert selector.pattern is not None
+        name = self.pipeline_compiler.new_name('_PATTERN')
+        self.pipeline_compiler.define(
+            f'{name} = re.compile({selector.pattern.pattern!r})'
+        )
+        return name
+
+    def gen_header_step(self, step: HeaderStep) -> None:
+        # like `VM.map_headers`, the labels are mapped rule by rule and the
+        # frame is relabeled once
+        self.emit('labels = list(data.columns)')
+        self.emit('positions = _positions(labels)')
+        for rule in step.rules:
+            if rule.selector.pattern is None:
+                # the header is known, so is what it is renamed to
+                column = rule.selector.column
+                assert column is not None
+                to_str = rule.pipeline(column)
+                self.emit(
+                    f'_rename(labels, positions, {column!r}, {to_str!r})'
+                )
+                continue
+            pattern = self.gen_pattern(rule.selector)
+            name = self.pipeline_compiler.gen_string_pipeline(rule.ops)
+            self.emit(
+                f'for label in dict.fromkeys('
+                f'[c for c in labels if {pattern}.match(c)]):'
+            )
+            self.emit(f'_rename(labels, positions, label, {name}(label))', 2)
+        self.emit('if labels != list(data.columns):')
+        self.emit('data = data.set_axis(labels, axis=1)', 2)
+
+    def gen_value_step(self, step: ValueStep) -> None:
+        if step.selector.pattern is not None:
+            pattern = self.gen_pattern(step.selector)
+            self.emit(
+                f'for col in [c for c in data.columns if {pattern}.match(c)]:'
+            )
+            col = 'col'
+        else:
+            col = repr(step.selector.column)
+            self.emit(f'if {col} in data.columns:')
+        source = self.pipeline_compiler.gen_values_pipeline(step.ops)
+        if source.lines:
+            self.emit(f's = data[{col}]', 2)
+        for line in source.lines:
+            self.emit(line, 2)
+        if source.is_constant:
+            self.emit(f'data[{col}] = {source.constant_value!r}', 2)
+        elif source.maybe_constant:
+            self.emit(f'_assign(data, {col}, s)', 2)
+        elif source.lines:
+            self.emit(f'data[{col}] = s', 2)
+        else:
+            self.emit('pass', 2)
@@ -0,0 +1,23 @@
+from typing import Any
+from typing import Union
+
+import pandas as pd  # type: ignore
+
+
+ConstantValue = Union[str, int, float, bool]
+
+
+class Constant:
+    # A column in which every row holds the same value. Literal operations
+    # (and maps that only see literals) produce a Constant instead of a
+    # Series, so the value stays a scalar until something needs the rows.
+    def __init__(self, value: ConstantValue, index: Any) -> None:
+        self.value = value
+        self.index = index
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def materialize(self) -> pd.Series:
+        # pandas broadcasts the scalar in bulk and infers the dtype
+        return pd.Series(self.value, index=self.index)
@@ -0,0 +1,24 @@
+import gc
+from contextlib import contextmanager
+from typing import Iterator
+
+
+# The front end allocates millions of objects (tokens, AST nodes) that all
+# live until it is done, and none of which form reference cycles. The
+# cyclic garbage collector finds nothing to free in them, but its
+# collections, triggered by the allocations, rescan everything allocated
+# so far; pausing it takes that time out.
+#
+# Pausing the collector is process wide, so only the CLI, which owns the
+# process, pauses it around the front end; `Lexer`, `Parser` and `analyze`
+# leave it alone when called as a library.
+
+@contextmanager
+def paused_gc() -> Iterator[None]:
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if was_enabled:
+            gc.enable()
@@ -0,0 +1,92 @@
+import csv
+import io
+import shutil
+from typing import BinaryIO
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from tnl.plan import HeaderStep
+from tnl.plan import Plan
+from tnl.vm import VM
+
+
+# A program with only `headers` blocks changes the header line and nothing
+# else, so instead of parsing every cell with `read_csv` and writing it
+# back with `to_csv`, the header line is rewritten and the rest of the file
+# is copied as raw bytes, in large blocks. Values are left exactly as they
+# are in the file (`1.50` stays `1.50`), and the header keeps the file's
+# line terminator.
+#
+# Files pandas would read differently go through pandas as before: files
+# it decompresses (by extension), and headers whose names it changes
+# (duplicate or empty names become `a.1` or `Unnamed: 2`), that it skips
+# (blank) or that aren't utf-8.
+
+COMPRESSED_EXTENSIONS = ('.gz', '.bz2', '.zip', '.xz', '.zst', '.tar')
+HEADER_MAX_BYTES = 1 << 20
+COPY_BLOCK_SIZE = 1 << 24
+
+
+def is_header_only(plan: Plan) -> bool:
+    return all(isinstance(step, HeaderStep) for step in plan.steps)
+
+
+def read_header(fp: BinaryIO) -> Optional[Tuple[List[str], bytes]]:
+    # The names in the header line and its line terminator, leaving `fp`
+    # at the start of the next line. None if pandas would read the header
+    # differently.
+    header = b''
+    while len(header) < HEADER_MAX_BYTES:
+        line = fp.readline(HEADER_MAX_BYTES)
+        header += line
+        # a quoted name may span lines
+        if not line.endswith(b'\n') or header.count(b'"') % 2 == 0:
+            break
+    if not header.endswith(b'\n') or header.count(b'"') % 2 != 0:
+        return None
+    terminator = b'\r\n' if header.endswith(b'\r\n') else b'\n'
+    try:
+        text = header[:-len(terminator)].decode('utf-8-sig')
+    except UnicodeDecodeError:
+        return None
+    if not text.strip():
+        return None
+    rows = list(csv.reader(io.StringIO(text, newline='')))
+    if len(rows) != 1:
+        return None
+    names = rows[0]
+    if '' in names or len(set(names)) != len(names):
+        return None
+    return names, terminator
+
+
+def header_line(names: List[str], terminator: bytes) -> bytes:
+    # quoted the way `to_csv` quotes them
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator=terminator.decode())
+    writer.writerow(names)
+    return out.getvalue().encode('utf-8')
+
+
+def map_header(plan: Plan, names: List[str]) -> List[str]:
+    for step in plan.steps:
+        assert isinstance(step, HeaderStep), 'plan has value steps'
+        names = VM.map_headers(step, names)
+    return names
+
+
+def copy_with_header(plan: Plan, data_file: str, out: BinaryIO) -> bool:
+    # Writes `data_file` with its header mapped by the header-only `plan`
+    # to `out`. Returns False, having written nothing, when the file has to
+    # go through pandas instead.
+    if data_file.lower().endswith(COMPRESSED_EXTENSIONS):
+        return False
+    with open(data_file, 'rb') as fp:
+        header = read_header(fp)
+        if header is None:
+            return False
+        names, terminator = header
+        out.write(header_line(map_header(plan, names), terminator))
+        shutil.copyfileobj(fp, out, COPY_BLOCK_SIZE)
+    return True
@@ -1,3 +1,4 @@
+import re
 from typing import List
 from typing import NoReturn
 from typing import Optional
@@ -7,6 +8,45 @@ from tnl.token import Token
 from tnl.token import TokenKind
 
 
+# The fast path (`Lexer.lex_fast`) finds tokens with regular expressions
+# instead of walking the source a character at a time, and produces the
+# same tokens and locations as the character lexer. It only handles ASCII
+# sources (where `isalpha` and `isdigit` mean [A-Za-z] and [0-9]) without
+# errors; anything else is left to the character lexer, which reports the
+# errors. A column selector of a plain string (`['col']`), which starts
+# every value rule, is matched whole and gives its three tokens at once.
+TOKEN_RE = re.compile(r'''
+    [ \t]*
+    (?:
+        (?P<selector>\['[^'\\\n]*'\])
+      | (?P<name>[A-Za-z_][A-Za-z0-9_]*)
+      | (?P<string>'(?:\\+[^\\]|[^'\\])*')
+      | (?P<symbol>->|==|[{}\[\]()=|*+%!-])
+      | (?P<newline>\n)
+      | (?P<number>[0-9]+)
+      | (?P<slash>/)
+      | (?P<comment>\#[^\n]*\n)
+      | (?P<error>['\#])
+      | (?P<invalid>.)
+      | (?P<eof>\Z)
+    )
+''', re.VERBOSE)
+# in strings and patterns, a run of backslashes escapes the next character
+PATTERN_BODY_RE = re.compile(r'((?:\\+[^\\]|[^/\\])*)/')
+SPACES_RE = re.compile(' *')
+
+NAME_KINDS = {'True': TokenKind.TRUE, 'False': TokenKind.FALSE}
+SYMBOL_KINDS = {
+    kind.value: kind for kind in TokenKind if isinstance(kind.value, str)
+}
+DIV_PREV_KINDS = {
+    TokenKind.NUMBER,
+    TokenKind.RBRACE,
+    TokenKind.STRING,
+    TokenKind.NAME,
+}
+
+
 class Lexer:
     def __init__(self, src: str, filename: str) -> None:
         self.src = src
@@ -53,6 +93,105 @@ class Lexer:
             return None
 
     def lex(self) -> List[Token]:
+        if self.src.isascii():
+            tokens = self.lex_fast()
+            if tokens is not None:
+                self.tokens = tokens
+                return tokens
+        return self.lex_chars()
+
+    def lex_fast(self) -> Optional[List[Token]]:
+        # None when the source has an error, for `lex_chars` to report
+        src = self.src
+        end = len(src)
+        tokens: List[Token] = []
+        append = tokens.append
+        match_token = TOKEN_RE.match
+        # tokens are built as tuples (`Token(...)` calls a python `__new__`)
+        new_token = tuple.__new__
+        # enum members as locals: looking one up on its class costs about
+        # as much as a function call before python 3.12
+        name_kind = TokenKind.NAME
+        string_kind = TokenKind.STRING
+        newline_kind = TokenKind.NEWLINE
+        number_kind = TokenKind.NUMBER
+        lbrace_kind = TokenKind.LBRACE
+        rbrace_kind = TokenKind.RBRACE
+        line = 1
+        # the column of `src[i]` is `i - line_start`: the first line's
+        # columns start at 1, and later lines' at 2
+        line_start = -1
+        i = 0
+        while True:
+            match = match_token(src, i)
+            assert match is not None
+            group = match.lastgroup
+            assert group is not None
+            # every group ends the match
+            start, i = match.span(group)
+            loc = (line, start - line_start)
+            if group == 'selector':
+                value = src[start + 2:i - 2]
+                append(new_token(Token, (lbrace_kind, '[', loc)))
+                string_loc = (line, start + 1 - line_start)
+                append(new_token(Token, (string_kind, value, string_loc)))
+                rbrace_loc = (line, i - 1 - line_start)
+                append(new_token(Token, (rbrace_kind, ']', rbrace_loc)))
+            elif group == 'name':
+                if i == end:
+                    return None
+                value = src[start:i]
+                kind = NAME_KINDS.get(value, name_kind)
+                append(new_token(Token, (kind, value, loc)))
+            elif group == 'string':
+                value = src[start + 1:i - 1].replace('\\', '')
+                append(new_token(Token, (string_kind, value, loc)))
+            elif group == 'symbol':
+                symbol = src[start:i]
+                if i == end and (symbol == '-' or symbol == '='):
+                    return None
+                kind = SYMBOL_KINDS[symbol]
+                append(new_token(Token, (kind, symbol, loc)))
+            elif group == 'newline':
+                append(new_token(Token, (newline_kind, None, loc)))
+                line += 1
+                line_start = start - 1
+            elif group == 'number':
+                if i == end:
+                    return None
+                append(new_token(Token, (number_kind, src[start:i], loc)))
+            elif group == 'slash':
+                spaces = SPACES_RE.match(src, i)
+                assert spaces is not None
+                next_non_space = spaces.end()
+                if (
+                    tokens and
+                    tokens[-1].kind in DIV_PREV_KINDS and
+                    next_non_space < end and (
+                        src[next_non_space].isalnum() or
+                        src[next_non_space] == '['
+                    )
+                ):
+                    append(Token(TokenKind.DIV, '/', loc))
+                    continue
+                body = PATTERN_BODY_RE.match(src, i)
+                if body is None:
+                    return None
+                append(Token(TokenKind.PATTERN, body.group(1), loc))
+                i = body.end()
+            elif group == 'comment':
+                line += 1
+                line_start = i - 2
+            elif group == 'invalid':
+                append(Token(TokenKind.INVALID, None, loc))
+            elif group == 'error':
+                return None
+            else:
+                break
+        append(Token(TokenKind.EOF, None, (line, end - line_start)))
+        return tokens
+
+    def lex_chars(self) -> List[Token]:
         self.tokens = []
         self.eat()
         while not self.reached_eof:
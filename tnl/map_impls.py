@@ -1,25 +1,46 @@
+import os
+import re
+from functools import lru_cache
+from operator import methodcaller
+from string import Formatter
+from typing import Any
 from typing import Callable
 from typing import Dict
 from typing import List
+from typing import Optional
 from typing import Protocol
+from typing import Tuple
 from typing import Type
 from typing import Union
 
 import numpy as np
 import pandas as pd  # type: ignore
 
-from tnl.ast import Number
-from tnl.ast import String
+from tnl.constant import Constant
+from tnl.map_specs import MAP_SPECS
 
 
 # TODO: is there a better way to represent types here?
 #       we currently have some `# type: ignore` comments
-#       elsewhere (at least in `tnl/vm.py`).
+#       elsewhere (at least in `tnl/plan.py`).
 
-# TODO: It might be better to unwrap Strings and Numbers in the vm
-#       and just pass primitive types here (we do this with ColumnSelectors
-#       already, where they are unwraped to pandas Series; it would be
-#       good to be consistent).
+# NOTE: map arguments are unwrapped by the plan compiler (`tnl/plan.py`),
+#       so String and Number arguments arrive here as `str` and `int`, and
+#       ColumnSelector arguments arrive as pandas Series.
+
+
+# `.str.removeprefix` and `.str.removesuffix` need pandas >= 1.4
+_HAS_STR_REMOVE_AFFIX = hasattr(pd.Series.str, 'removeprefix')
+
+
+def _map_elements(s: pd.Series, fn: Callable[[Any], Any]) -> pd.Series:
+    # `fn` applied to each value but missing ones, like a `.str` method:
+    # the result keeps the column's dtype, where `map` infers one from the
+    # results (float64 for a column with only missing values)
+    result = s.map(fn, na_action='ignore')
+    if result.dtype != s.dtype:
+        result = result.astype(s.dtype)
+    return result
 
 
 MAP_VALUES_IMPL_REGISTRY: Dict[str, Type['MapImpl']] = {}
@@ -27,6 +48,9 @@ MAP_STRING_IMPL_REGISTRY: Dict[str, Type['MapImpl']] = {}
 
 
 def register_impl(map_name: str) -> Callable[['Type[MapImpl]'], None]:
+    # the map's arity and properties are declared in `tnl/map_specs.py`
+    assert map_name in MAP_SPECS, f'no spec for map {map_name}'
+
     def wrapper(cls: 'Type[MapImpl]') -> None:
         if hasattr(cls, 'map_values'):
             MAP_VALUES_IMPL_REGISTRY[map_name] = cls
@@ -37,184 +61,250 @@ def register_impl(map_name: str) -> Callable[['Type[MapImpl]'], None]:
 
 
 class MapImpl(Protocol):
-    num_args: int
+    # Implementations must not modify the Series they are given (neither
+    # the input nor ColumnSelector arguments): the VM passes columns of
+    # the frame without copying them and relies on maps returning new
+    # Series. A map whose result is the same for every row may return a
+    # `Constant` instead.
+    #
+    # A map may also define `gen_map_values(series_ref, *arg_refs)`,
+    # returning the python expression `map_values` computes (given the
+    # expressions for its input and arguments), for generated code.
+    #
+    # A string map whose result for a missing value isn't missing may
+    # define `map_values_with(s, map_string, *args)`: `map_values` calling
+    # `map_string` (its `map_string` with the arguments bound, or a
+    # memoized one) for the values it maps one at a time.
+    pass
 
 
 @register_impl(map_name='add')
 class AddImpl(MapImpl):
-    num_args = 1
-
     @staticmethod
-    def map_values(s: pd.Series, *args: Number) -> pd.Series:
-        return s + args[0].data
+    def map_values(s: pd.Series, *args: int) -> pd.Series:
+        return s + args[0]
 
-    # TODO: this is an example - add others later when we get
-    #       to code generation
-    # @staticmethod
-    # def gen_map_values(series_ref: str, *args: Number) -> str:
-    #     # think this will just generate code for right hand side
-    #     return f'({series_ref} + 1)'
+    @staticmethod
+    def gen_map_values(series_ref: str, *arg_refs: str) -> str:
+        return f'{series_ref} + {arg_refs[0]}'
 
 
 @register_impl(map_name='mult')
 class MultImpl(MapImpl):
-    num_args = 1
+    @staticmethod
+    def map_values(s: pd.Series, *args: int) -> pd.Series:
+        return s * args[0]
 
     @staticmethod
-    def map_values(s: pd.Series, *args: Number) -> pd.Series:
-        return s * args[0].data
+    def gen_map_values(series_ref: str, *arg_refs: str) -> str:
+        return f'{series_ref} * {arg_refs[0]}'
 
 
 @register_impl(map_name='power')
 class PowerImpl(MapImpl):
-    num_args = 1
+    @staticmethod
+    def map_values(s: pd.Series, *args: int) -> pd.Series:
+        return s ** args[0]
 
     @staticmethod
-    def map_values(s: pd.Series, *args: Number) -> pd.Series:
-        return s ** args[0].data
+    def gen_map_values(series_ref: str, *arg_refs: str) -> str:
+        return f'{series_ref} ** {arg_refs[0]}'
 
 
 @register_impl(map_name='divide')
 class DivideImpl(MapImpl):
-    num_args = 1
+    @staticmethod
+    def map_values(s: pd.Series, *args: int) -> pd.Series:
+        return s // args[0]
 
     @staticmethod
-    def map_values(s: pd.Series, *args: Number) -> pd.Series:
-        return s // args[0].data
+    def gen_map_values(series_ref: str, *arg_refs: str) -> str:
+        return f'{series_ref} // {arg_refs[0]}'
 
 
 @register_impl(map_name='auto_inc')
 class AutoIncImpl(MapImpl):
-    num_args = 0
-
     @staticmethod
-    def map_values(s: pd.Series) -> pd.Series:
+    def map_values(s: pd.Series, row_offset: int = 0) -> pd.Series:
+        start = row_offset + 1
         return pd.Series(
-            data=(i for i in range(1, len(s) + 1)),
-            dtype=np.uint64,
+            data=np.arange(start, start + len(s), dtype=np.uint64),
+            index=s.index,
         )
 
 
 @register_impl(map_name='round')
 class RoundImpl(MapImpl):
-    num_args = 1
-
     @staticmethod
-    def map_values(s: pd.Series, *args: Number) -> pd.Series:
+    def map_values(s: pd.Series, *args: int) -> pd.Series:
         # TODO: this shows it probably makes sense to have Int and Float
         #       types (that the type checker could check)
-        return s.round(decimals=args[0].data)
+        return s.round(decimals=args[0])
+
+
+def _reduce_operands(
+    ufunc: np.ufunc,
+    s: pd.Series,
+    operands: Tuple[Union[pd.Series, int], ...],
+) -> pd.Series:
+    # Folds the operands row-wise into a single result buffer, so any
+    # number of columns costs one output array (no temporary frame).
+    # Literals promote like int64/float64 columns, as in a frame of the
+    # operands: a uint64 column (`auto_inc`) and an int give float64.
+    arrays = [
+        operand.to_numpy() if isinstance(operand, pd.Series) else operand
+        for operand in operands
+    ]
+    dtypes = [np.asarray(array).dtype for array in arrays]
+    result = np.empty(len(s), dtype=np.result_type(*dtypes))
+    result[...] = arrays[0]
+    for array in arrays[1:]:
+        ufunc(result, array, out=result)
+    return pd.Series(result, index=s.index)
+
+
+def _lookup_values(
+    s: pd.Series,
+    table: pd.Series,
+    default: Optional[str],
+) -> pd.Series:
+    # One hash join of the whole column against `table` (values indexed by
+    # unique text keys), rather than a pass over the column per entry.
+    # Values are looked up as text; missing values stay missing, and values
+    # not in the table become `default`, or are kept when there is none.
+    missing = s.isna().to_numpy()
+    keys = s if pd.api.types.is_string_dtype(s) else s.astype(str)
+    codes = table.index.get_indexer(keys)
+    found = (codes != -1) & ~missing
+    result = s.to_numpy(dtype=object, copy=True)
+    result[found] = table.to_numpy()[codes[found]]
+    if default is not None:
+        result[~found & ~missing] = default
+    return pd.Series(result, index=s.index)
+
+
+def _lookup_string(s: str, table: pd.Series, default: Optional[str]) -> str:
+    if s in table.index:
+        return str(table[s])
+    return s if default is None else default
+
+
+def _lookup_table(keys: List[str], values: List[str]) -> pd.Series:
+    # later entries for a key win, like they would in a dict
+    table = pd.Series(values, index=keys, dtype=object)
+    return table[~table.index.duplicated(keep='last')]
 
 
 @register_impl(map_name='mean')
 class MeanImpl(MapImpl):
-    num_args = 2
-
     @staticmethod
     def map_values(
         s: pd.Series,
-        *args: Union[pd.Series, Number],
+        *args: Union[pd.Series, int],
     ) -> pd.Series:
-        operands: List[Union[int, float, pd.Series]] = []
-        for arg in args:
-            if isinstance(arg, Number):
-                operands.append(arg.data)
-            else:
-                operands.append(arg)
-        return (operands[0] + operands[1]) / 2
+        if not any(isinstance(arg, pd.Series) for arg in args):
+            return Constant(sum(args) / len(args), s.index)
+        # NaN propagates, like it does for `(a + b) / 2`
+        total = _reduce_operands(np.add, s, (0.0, *args))
+        return total / len(args)
 
 
 @register_impl(map_name='max')
 class MaxImpl(MapImpl):
-    num_args = 2
-
     @staticmethod
     def map_values(
         s: pd.Series,
-        *args: Union[pd.Series, Number],
+        *args: Union[pd.Series, int],
     ) -> pd.Series:
-        operands: List[Union[int, float, pd.Series]] = []
-        at_least_one_series = False
-        for arg in args:
-            if isinstance(arg, Number):
-                operands.append(arg.data)
-            else:
-                at_least_one_series = True
-                operands.append(arg)
-        if at_least_one_series:
-            df = pd.DataFrame(
-                {str(i): operand for i, operand in enumerate(operands)}
-            )
-            return df.max(axis=1)
-        else:
-            m = max(operands)
-            return pd.Series(m for _ in range(len(s)))
+        if not any(isinstance(arg, pd.Series) for arg in args):
+            return Constant(max(args), s.index)
+        # `fmax` skips NaN, like `DataFrame.max(axis=1)` does
+        return _reduce_operands(np.fmax, s, args)
 
 
 @register_impl(map_name='min')
 class MinImpl(MapImpl):
-    num_args = 2
-
     @staticmethod
     def map_values(
         s: pd.Series,
-        *args: Union[pd.Series, Number],
+        *args: Union[pd.Series, int],
     ) -> pd.Series:
-        operands: List[Union[int, float, pd.Series]] = []
-        at_least_one_series = False
-        for arg in args:
-            if isinstance(arg, Number):
-                operands.append(arg.data)
-            else:
-                at_least_one_series = True
-                operands.append(arg)
-        if at_least_one_series:
-            df = pd.DataFrame(
-                {str(i): operand for i, operand in enumerate(operands)}
-            )
-            return df.min(axis=1)
-        else:
-            m = min(operands)
-            return pd.Series(m for _ in range(len(s)))
+        if not any(isinstance(arg, pd.Series) for arg in args):
+            return Constant(min(args), s.index)
+        # `fmin` skips NaN, like `DataFrame.min(axis=1)` does
+        return _reduce_operands(np.fmin, s, args)
 
 
 @register_impl(map_name='replace')
 class ReplaceImpl(MapImpl):
-    num_args = 2
+    @staticmethod
+    def map_values(s: pd.Series, *args: str) -> pd.Series:
+        return s.str.replace(args[0], args[1], regex=False)
 
     @staticmethod
-    def map_values(s: pd.Series, *args: String) -> pd.Series:
-        return s.str.replace(args[0].data, args[1].data)
+    def map_string(s: str, *args: str) -> str:
+        return s.replace(args[0], args[1])
+
+
+class MultiReplaceImpl(MapImpl):
+    # A run of literal `replace` maps done in one pass, with an alternation
+    # of their patterns; `args` are their (from, to) pairs in order. Built
+    # by the plan compiler, only for runs where this gives the same result
+    # as replacing one after the other.
 
     @staticmethod
-    def map_string(s: str, *args: String) -> str:
-        return s.replace(args[0].data, args[1].data)
+    @lru_cache(maxsize=None)
+    def _compile(*args: str) -> Callable[[str], str]:
+        replacements = dict(zip(args[::2], args[1::2]))
+        alternation = '|'.join(map(re.escape, replacements))
+        # splitting on a group keeps the matches at the odd positions
+        split = re.compile(f'({alternation})').split
+        replace = replacements.__getitem__
+
+        def replace_all(s: str) -> str:
+            parts = split(s)
+            if len(parts) == 1:
+                return s
+            parts[1::2] = map(replace, parts[1::2])
+            return ''.join(parts)
+
+        return replace_all
+
+    @classmethod
+    def map_values(cls, s: pd.Series, *args: str) -> pd.Series:
+        return _map_elements(s, cls._compile(*args))
+
+    @classmethod
+    def map_string(cls, s: str, *args: str) -> str:
+        return cls._compile(*args)(s)
 
 
 @register_impl(map_name='replace_last')
 class ReplaceLastImpl(MapImpl):
-    num_args = 2
-
     @staticmethod
     def _replace_last_in_str(s: str, from_str: str, to_str: str) -> str:
         last = s.rsplit(from_str, 1)
         return to_str.join(last)
 
-    @classmethod
-    def map_values(cls, s: pd.Series, *args: String) -> pd.Series:
-        return s.apply(
-            lambda x: cls._replace_last_in_str(x, args[0].data, args[1].data)
-        )
+    @staticmethod
+    def map_values(s: pd.Series, *args: str) -> pd.Series:
+        from_str, to_str = args
+
+        # one call per element (the body of `_replace_last_in_str`
+        # inlined); a regex such as /(.*)from/ backtracks over the whole
+        # string and is several times slower with python's `re`
+        def replace_last(x: str) -> str:
+            return to_str.join(x.rsplit(from_str, 1))
+
+        return _map_elements(s, replace_last)
 
     @classmethod
-    def map_string(cls, s: str, *args: String) -> str:
-        return cls._replace_last_in_str(s, args[0].data, args[1].data)
+    def map_string(cls, s: str, *args: str) -> str:
+        return cls._replace_last_in_str(s, args[0], args[1])
 
 
 @register_impl(map_name='trim')
 class TrimImpl(MapImpl):
-    num_args = 0
-
     @staticmethod
     def map_values(s: pd.Series) -> pd.Series:
         return s.str.strip()
@@ -226,21 +316,17 @@ class TrimImpl(MapImpl):
 
 @register_impl(map_name='slice')
 class SliceImpl(MapImpl):
-    num_args = 2
-
     @staticmethod
-    def map_values(s: pd.Series, *args: Number) -> pd.Series:
-        return s.str.slice(start=args[0].data, stop=args[1].data)
+    def map_values(s: pd.Series, *args: int) -> pd.Series:
+        return s.str.slice(start=args[0], stop=args[1])
 
     @staticmethod
-    def map_string(s: str, *args: Number) -> str:
-        return s[args[0].data:args[1].data]
+    def map_string(s: str, *args: int) -> str:
+        return s[args[0]:args[1]]
 
 
 @register_impl(map_name='title')
 class TitleImpl(MapImpl):
-    num_args = 0
-
     @staticmethod
     def map_values(s: pd.Series) -> pd.Series:
         return s.str.title()
@@ -252,8 +338,6 @@ class TitleImpl(MapImpl):
 
 @register_impl(map_name='upper')
 class UpperImpl(MapImpl):
-    num_args = 0
-
     @staticmethod
     def map_values(s: pd.Series) -> pd.Series:
         return s.str.upper()
@@ -265,8 +349,6 @@ class UpperImpl(MapImpl):
 
 @register_impl(map_name='lower')
 class LowerImpl(MapImpl):
-    num_args = 0
-
     @staticmethod
     def map_values(s: pd.Series) -> pd.Series:
         return s.str.lower()
@@ -278,64 +360,160 @@ class LowerImpl(MapImpl):
 
 @register_impl(map_name='remove_prefix')
 class RemovePrefixImpl(MapImpl):
-    num_args = 1
-
     @staticmethod
-    def map_values(s: pd.Series, *args: String) -> pd.Series:
-        return s.apply(lambda x: x.removeprefix(args[0].data))
+    def map_values(s: pd.Series, *args: str) -> pd.Series:
+        if _HAS_STR_REMOVE_AFFIX:
+            return s.str.removeprefix(args[0])
+        return _map_elements(s, methodcaller('removeprefix', args[0]))
 
     @staticmethod
-    def map_string(s: str, *args: String) -> str:
-        return s.removeprefix(args[0].data)
+    def map_string(s: str, *args: str) -> str:
+        return s.removeprefix(args[0])
 
 
 @register_impl(map_name='remove_suffix')
 class RemoveSuffixImpl(MapImpl):
-    num_args = 1
-
     @staticmethod
-    def map_values(s: pd.Series, *args: String) -> pd.Series:
-        return s.apply(lambda x: x.removesuffix(args[0].data))
+    def map_values(s: pd.Series, *args: str) -> pd.Series:
+        if _HAS_STR_REMOVE_AFFIX:
+            return s.str.removesuffix(args[0])
+        return _map_elements(s, methodcaller('removesuffix', args[0]))
 
     @staticmethod
-    def map_string(s: str, *args: String) -> str:
-        return s.removesuffix(args[0].data)
+    def map_string(s: str, *args: str) -> str:
+        return s.removesuffix(args[0])
 
 
 @register_impl(map_name='concat')
 class ConcatImpl(MapImpl):
-    num_args = 3  # TODO: change to variable args when supported
-
     @staticmethod
     def map_values(
         s: pd.Series,
-        *args: Union[String, pd.Series],
+        *args: Union[str, pd.Series],
     ) -> pd.Series:
-        operands: List[Union[str, pd.Series]] = []
-        for arg in args:
-            if isinstance(arg, String):
-                operands.append(arg.data)
-            else:
-                operands.append(arg)
-        return operands[0] + operands[1] + operands[2]
+        if not any(isinstance(arg, pd.Series) for arg in args):
+            return Constant(''.join(args), s.index)
+        result = args[0]
+        for arg in args[1:]:
+            result = result + arg
+        return result
 
     @staticmethod
-    def map_string(s: str, *args: String) -> str:
-        return args[0].data + args[1].data + args[2].data
+    def map_string(s: str, *args: str) -> str:
+        return ''.join(args)
 
 
 @register_impl(map_name='format')
 class FormatImpl(MapImpl):
-    num_args = 1
+    @staticmethod
+    def _split_simple_template(template: str) -> Optional[Tuple[str, str]]:
+        # 'prefix {} suffix' -> ('prefix ', ' suffix'), or None when the
+        # template has more than one field, a format spec or a conversion
+        fields = list(Formatter().parse(template))
+        field_idxs = [
+            i for i, (_, field_name, _, _) in enumerate(fields)
+            if field_name is not None
+        ]
+        if len(field_idxs) != 1:
+            return None
+        field_idx = field_idxs[0]
+        _, field_name, format_spec, conversion = fields[field_idx]
+        if field_name not in ('', '0') or format_spec or conversion:
+            return None
+        prefix = ''.join(text for text, _, _, _ in fields[:field_idx + 1])
+        suffix = ''.join(text for text, _, _, _ in fields[field_idx + 1:])
+        return prefix, suffix
+
+    @classmethod
+    def map_values(cls, s: pd.Series, *args: str) -> pd.Series:
+        return cls.map_values_with(s, args[0].format, *args)
+
+    @classmethod
+    def map_values_with(
+        cls,
+        s: pd.Series,
+        map_string: Callable[[Any], str],
+        *args: str,
+    ) -> pd.Series:
+        template = args[0]
+        prefix_suffix = cls._split_simple_template(template)
+        if (
+            prefix_suffix is not None and
+            not s.hasnans and
+            pd.api.types.infer_dtype(s) == 'string'
+        ):
+            # only strings and no missing values: '{}'.format(x) is plain
+            # concatenation, which pandas does without a call per element
+            prefix, suffix = prefix_suffix
+            return prefix + s + suffix
+        return s.map(map_string)
+
+    @staticmethod
+    def map_string(s: str, *args: str) -> str:
+        return args[0].format(s)
+
+
+@register_impl(map_name='lookup')
+class LookupImpl(MapImpl):
+    # args: the table's file, its key column, its value column, and
+    # optionally the value for keys that aren't in the table
 
     @staticmethod
-    def map_values(s: pd.Series, *args: String) -> pd.Series:
-        return s.apply(lambda x: args[0].data.format(x))
+    @lru_cache(maxsize=None)
+    def _read_table(
+        path: str,
+        mtime_ns: int,
+        key_column: str,
+        value_column: str,
+    ) -> pd.Series:
+        # cached for the life of the process (e.g. across the files of a
+        # batch), until the file changes
+        data = pd.read_csv(
+            path,
+            usecols=[key_column, value_column],
+            dtype=str,
+            keep_default_na=False,
+        )
+        return _lookup_table(
+            data[key_column].tolist(),
+            data[value_column].tolist(),
+        )
+
+    @classmethod
+    def _table(cls, *args: str) -> pd.Series:
+        path, key_column, value_column = args[:3]
+        mtime_ns = os.stat(path).st_mtime_ns
+        return cls._read_table(path, mtime_ns, key_column, value_column)
+
+    @classmethod
+    def map_values(cls, s: pd.Series, *args: str) -> pd.Series:
+        default = args[3] if len(args) > 3 else None
+        return _lookup_values(s, cls._table(*args), default)
+
+    @classmethod
+    def map_string(cls, s: str, *args: str) -> str:
+        default = args[3] if len(args) > 3 else None
+        return _lookup_string(s, cls._table(*args), default)
+
+
+@register_impl(map_name='lookup_pairs')
+class LookupPairsImpl(MapImpl):
+    # args: keys and values in turn, and optionally a last, unpaired value
+    # for keys that aren't in the table; numbers are taken as text
 
     @staticmethod
-    def map_string(s: str, *args: String) -> str:
-        return args[0].data.format(s)
+    @lru_cache(maxsize=None)
+    def _table(*args: Any) -> Tuple[pd.Series, Optional[str]]:
+        texts = [str(arg) for arg in args]
+        default = texts.pop() if len(texts) % 2 else None
+        return _lookup_table(texts[::2], texts[1::2]), default
 
+    @classmethod
+    def map_values(cls, s: pd.Series, *args: Any) -> pd.Series:
+        table, default = cls._table(*args)
+        return _lookup_values(s, table, default)
 
-MAP_IMPL_REGISTRY = {**MAP_VALUES_IMPL_REGISTRY, **MAP_STRING_IMPL_REGISTRY}
-BUILT_IN_FUNCTIONS = set(MAP_IMPL_REGISTRY.keys())
+    @classmethod
+    def map_string(cls, s: str, *args: Any) -> str:
+        table, default = cls._table(*args)
+        return _lookup_string(s, table, default)
@@ -0,0 +1,68 @@
+from typing import Dict
+
+
+# What the front end needs to know about each built-in map, kept apart from
+# the implementations in `tnl/map_impls.py` so that lexing, parsing and
+# checking a program doesn't import pandas and numpy.
+
+class MapSpec:
+    def __init__(
+        self,
+        name: str,
+        num_args: int,
+        variadic: bool = False,
+        maps_strings: bool = False,
+        row_local: bool = True,
+        keeps_missing: bool = True,
+    ) -> None:
+        self.name = name
+        self.num_args = num_args
+        # variadic maps take `num_args` or more arguments
+        self.variadic = variadic
+        # every map applies to column values; some also apply to single
+        # strings (headers, and literals known before any data is read)
+        self.maps_strings = maps_strings
+        # a map that is not row local depends on where its rows sit in the
+        # whole input; its `map_values` then takes a `row_offset` keyword
+        # giving the position of the first row it is passed (for chunked
+        # input)
+        self.row_local = row_local
+        # whether missing values in a column stay missing; string maps
+        # that keep them can be fused into a pass that skips them
+        self.keeps_missing = keeps_missing
+
+
+MAP_SPECS: Dict[str, MapSpec] = {
+    spec.name: spec
+    for spec in [
+        MapSpec('add', 1),
+        MapSpec('mult', 1),
+        MapSpec('power', 1),
+        MapSpec('divide', 1),
+        MapSpec('auto_inc', 0, row_local=False),
+        MapSpec('round', 1),
+        MapSpec('mean', 2, variadic=True),
+        MapSpec('max', 2, variadic=True),
+        MapSpec('min', 2, variadic=True),
+        MapSpec('replace', 2, maps_strings=True),
+        MapSpec('replace_last', 2, maps_strings=True),
+        MapSpec('trim', 0, maps_strings=True),
+        MapSpec('slice', 2, maps_strings=True),
+        MapSpec('title', 0, maps_strings=True),
+        MapSpec('upper', 0, maps_strings=True),
+        MapSpec('lower', 0, maps_strings=True),
+        MapSpec('remove_prefix', 1, maps_strings=True),
+        MapSpec('remove_suffix', 1, maps_strings=True),
+        MapSpec(
+            'concat',
+            2,
+            variadic=True,
+            maps_strings=True,
+            keeps_missing=False,
+        ),
+        MapSpec('format', 1, maps_strings=True, keeps_missing=False),
+        MapSpec('lookup', 3, variadic=True, maps_strings=True),
+        MapSpec('lookup_pairs', 2, variadic=True, maps_strings=True),
+    ]
+}
+BUILT_IN_FUNCTIONS = set(MAP_SPECS.keys())
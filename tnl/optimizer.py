@@ -0,0 +1,183 @@
+from typing import List
+from typing import Optional
+from typing import Set
+
+from tnl.ast import ASTNode
+from tnl.ast import Boolean
+from tnl.ast import ColumnSelector
+from tnl.ast import Header
+from tnl.ast import HeaderRule
+from tnl.ast import Map
+from tnl.ast import Name
+from tnl.ast import Number
+from tnl.ast import Operation
+from tnl.ast import Pattern
+from tnl.ast import Pipeline
+from tnl.ast import String
+from tnl.ast import ValueBlock
+from tnl.ast import ValueRule
+from tnl.ast_visitor import ASTVisitor
+
+
+# Removes work whose result is thrown away, in place, and returns a note
+# for each removal. Runs after semantic analysis, so the AST is valid.
+#
+# - dead operations: everything before the last literal or column selector
+#   in a pipeline, since those replace the value (`trim | upper | 'n/a'`)
+# - dead rules: a value rule whose columns a later rule of the same
+#   `values` block overwrites without using their values, when no rule in
+#   between reads those columns
+
+def optimize(ast: ASTNode) -> List[str]:
+    optimizer = Optimizer(ast)
+    notes = optimizer.optimize()
+    return notes
+
+
+class Optimizer(ASTVisitor):
+    def __init__(self, ast: ASTNode) -> None:
+        self.ast = ast
+        self.notes: List[str] = []
+
+    def optimize(self) -> List[str]:
+        self.notes = []
+        self.visit(self.ast)
+        return self.notes
+
+    def visit_HeaderRule(self, node: HeaderRule) -> None:
+        self.remove_dead_operations(describe(node.header), node.pipeline)
+
+    def visit_ValueRule(self, node: ValueRule) -> None:
+        self.remove_dead_operations(describe(node.rvalue), node.pipeline)
+
+    def visit_ValueBlock(self, node: ValueBlock) -> None:
+        for value_rule in node.value_rules:
+            self.visit(value_rule)
+        live_rules = []
+        for i, value_rule in enumerate(node.value_rules):
+            later_rule = find_overwriting_rule(
+                value_rule,
+                node.value_rules[i + 1:],
+            )
+            if later_rule is None:
+                live_rules.append(value_rule)
+                continue
+            self.notes.append(
+                f'Removed rule {describe(value_rule.rvalue)} -> '
+                f'{describe_pipeline(value_rule.pipeline)} (overwritten by '
+                f'{describe(later_rule.rvalue)} -> '
+                f'{describe_pipeline(later_rule.pipeline)})'
+            )
+        node.value_rules = live_rules
+
+    def remove_dead_operations(self, target: str, node: Pipeline) -> None:
+        last_source = max(
+            (i for i, op in enumerate(node.operations) if is_source(op)),
+            default=0,
+        )
+        if last_source == 0:
+            return
+        dead_operations = Pipeline(node.operations[:last_source])
+        node.operations = node.operations[last_source:]
+        self.notes.append(
+            f'Removed {describe_pipeline(dead_operations)} from rule '
+            f'{target} (replaced by {describe(node.operations[0])})'
+        )
+
+
+def is_source(node: Operation) -> bool:
+    # operations whose result doesn't depend on the value piped into them
+    return isinstance(node, (String, Number, Boolean, ColumnSelector))
+
+
+def reads_input(node: ValueRule) -> bool:
+    operations = node.pipeline.operations
+    return not operations or not is_source(operations[0])
+
+
+def column_reads(node: ValueRule) -> Optional[Set[str]]:
+    # None when the columns can't be known statically
+    reads: Set[str] = set()
+    selectors: List[ColumnSelector] = []
+    for operation in node.pipeline.operations:
+        if isinstance(operation, ColumnSelector):
+            selectors.append(operation)
+        elif isinstance(operation, Map):
+            selectors.extend(
+                arg for arg in operation.args
+                if isinstance(arg, ColumnSelector)
+            )
+        elif not isinstance(operation, (String, Number, Boolean)):
+            return None
+    for selector in selectors:
+        if not isinstance(selector.header, String):
+            return None
+        reads.add(selector.header.data)
+    return reads
+
+
+def may_overlap(header: Header, other: Header) -> bool:
+    if isinstance(header, String) and isinstance(other, String):
+        return header.data == other.data
+    if isinstance(header, String) and isinstance(other, Pattern):
+        return other.compile().match(header.data) is not None
+    if isinstance(header, Pattern) and isinstance(other, String):
+        return header.compile().match(other.data) is not None
+    return True
+
+
+def covers(header: Header, other: Header) -> bool:
+    # whether every column `other` selects is also selected by `header`
+    if isinstance(header, String) and isinstance(other, String):
+        return header.data == other.data
+    if isinstance(header, Pattern) and isinstance(other, String):
+        return header.compile().match(other.data) is not None
+    if isinstance(header, Pattern) and isinstance(other, Pattern):
+        return header.data == other.data
+    return False
+
+
+def find_overwriting_rule(
+    node: ValueRule,
+    later_rules: List[ValueRule],
+) -> Optional[ValueRule]:
+    if not isinstance(node.rvalue, ColumnSelector):
+        return None
+    target = node.rvalue.header
+    if isinstance(target, Name):
+        return None
+    for later_rule in later_rules:
+        if not isinstance(later_rule.rvalue, ColumnSelector):
+            return None
+        reads = column_reads(later_rule)
+        if reads is None:
+            return None
+        if any(may_overlap(target, String(col)) for col in reads):
+            return None
+        later_target = later_rule.rvalue.header
+        if not may_overlap(target, later_target):
+            continue
+        if reads_input(later_rule):
+            return None
+        if covers(later_target, target):
+            return later_rule
+    return None
+
+
+def describe(node: ASTNode) -> str:
+    if isinstance(node, String):
+        return f'\'{node.data}\''
+    elif isinstance(node, Pattern):
+        return f'/{node.data}/'
+    elif isinstance(node, (Number, Boolean, Name)):
+        return f'{node.data}'
+    elif isinstance(node, ColumnSelector):
+        return f'[{describe(node.header)}]'
+    elif isinstance(node, Map):
+        return ' '.join([node.name.data, *map(describe, node.args)])
+    else:
+        return node.__class__.__name__
+
+
+def describe_pipeline(node: Pipeline) -> str:
+    return ' | '.join(map(describe, node.operations)) or '{}'
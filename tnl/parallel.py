@@ -0,0 +1,200 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Any
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+import pandas as pd  # type: ignore
+
+from tnl.ast import Module
+from tnl.batch import transform_file
+from tnl.plan import compile_plan
+from tnl.plan import MemoStats
+from tnl.plan import Plan
+from tnl.vm import transform
+
+
+# Every built-in map except `auto_inc` is row local, so a program can run
+# on row shards independently and the shards are concatenated back in
+# order. `auto_inc` is told where its shard starts via `row_offset`.
+#
+# Plans hold generated functions that can't be pickled, so each worker
+# process is sent the AST once and compiles its own plan.
+#
+# In batch mode the unit of work is a whole data file instead of a shard.
+#
+# Each worker memoizes on its own (see `tnl.plan.compile_plan`), and sends
+# its memo stats so far back with every result; the latest ones of each
+# worker process add up to the memo stats of the run.
+
+_worker_plan: Optional[Plan] = None
+_worker_threads = 1
+
+
+def _init_worker(
+    ast: Module,
+    threads: int,
+    memo_size: Optional[int],
+) -> None:
+    global _worker_plan, _worker_threads
+    _worker_plan = compile_plan(ast, memo_size)
+    _worker_threads = threads
+
+
+WorkerMemoStats = Tuple[int, MemoStats]
+
+
+def _worker_memo_stats() -> WorkerMemoStats:
+    assert _worker_plan is not None, 'worker was not initialized'
+    return os.getpid(), _worker_plan.memo_stats()
+
+
+def total_memo_stats(worker_stats: Iterable[WorkerMemoStats]) -> MemoStats:
+    latest: Dict[int, MemoStats] = dict(worker_stats)
+    total = MemoStats(0, 0, 0)
+    for stats in latest.values():
+        total.hits += stats.hits
+        total.misses += stats.misses
+        total.size += stats.size
+    return total
+
+
+def _transform_shard(
+    data: pd.DataFrame,
+    row_offset: int,
+) -> Tuple[pd.DataFrame, WorkerMemoStats]:
+    assert _worker_plan is not None, 'worker was not initialized'
+    result = transform(_worker_plan, data, row_offset, _worker_threads)
+    return result, _worker_memo_stats()
+
+
+def _transform_file(
+    data_file: str,
+    out_file: str,
+    chunk_size: Optional[int],
+    raw_columns: bool,
+) -> WorkerMemoStats:
+    assert _worker_plan is not None, 'worker was not initialized'
+    transform_data = partial(transform, _worker_plan, workers=_worker_threads)
+    transform_file(
+        transform_data,
+        data_file,
+        out_file,
+        chunk_size,
+        _worker_plan if raw_columns else None,
+    )
+    return _worker_memo_stats()
+
+
+def shard_bounds(num_rows: int, num_shards: int) -> List[Tuple[int, int]]:
+    num_shards = max(1, min(num_shards, num_rows))
+    size, extra = divmod(num_rows, num_shards)
+    bounds = []
+    start = 0
+    for i in range(num_shards):
+        stop = start + size + (1 if i < extra else 0)
+        bounds.append((start, stop))
+        start = stop
+    return bounds
+
+
+class ParallelTransform:
+    # Keeps one pool of `jobs` worker processes alive, so it can be called
+    # on many frames (e.g. the chunks of a streamed file) without paying
+    # for process start up and plan compilation each time.
+    def __init__(
+        self,
+        ast: Module,
+        jobs: int,
+        threads: int = 1,
+        memo_size: Optional[int] = None,
+    ) -> None:
+        self.jobs = jobs
+        self.worker_memo_stats: Dict[int, MemoStats] = {}
+        self.executor = ProcessPoolExecutor(
+            max_workers=jobs,
+            initializer=_init_worker,
+            initargs=(ast, threads, memo_size),
+        )
+
+    def __enter__(self) -> 'ParallelTransform':
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.executor.shutdown()
+
+    def memo_stats(self) -> MemoStats:
+        # over the frames transformed so far
+        return total_memo_stats(self.worker_memo_stats.items())
+
+    def __call__(
+        self,
+        data: pd.DataFrame,
+        row_offset: int = 0,
+    ) -> pd.DataFrame:
+        bounds = shard_bounds(len(data), self.jobs)
+        futures = [
+            self.executor.submit(
+                _transform_shard,
+                data.iloc[start:stop],
+                row_offset + start,
+            )
+            for start, stop in bounds
+        ]
+        shards = []
+        for future in futures:
+            shard, (pid, memo_stats) = future.result()
+            shards.append(shard)
+            self.worker_memo_stats[pid] = memo_stats
+        if len(shards) == 1:
+            return shards[0]
+        return pd.concat(shards)
+
+
+def transform_parallel(
+    ast: Module,
+    data: pd.DataFrame,
+    jobs: int,
+    threads: int = 1,
+    memo_size: Optional[int] = None,
+) -> pd.DataFrame:
+    parallel_transform = ParallelTransform(ast, jobs, threads, memo_size)
+    with parallel_transform:
+        return parallel_transform(data)
+
+
+def transform_files_parallel(
+    ast: Module,
+    file_pairs: List[Tuple[str, str]],
+    jobs: int,
+    threads: int = 1,
+    memo_size: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+    raw_columns: bool = False,
+) -> MemoStats:
+    # with `raw_columns`, untouched columns are carried through, see
+    # `tnl.raw_columns`
+    executor = ProcessPoolExecutor(
+        max_workers=max(1, min(jobs, len(file_pairs))),
+        initializer=_init_worker,
+        initargs=(ast, threads, memo_size),
+    )
+    with executor:
+        futures = [
+            executor.submit(
+                _transform_file,
+                data_file,
+                out_file,
+                chunk_size,
+                raw_columns,
+            )
+            for data_file, out_file in file_pairs
+        ]
+        return total_memo_stats(future.result() for future in futures)
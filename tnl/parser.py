@@ -1,6 +1,7 @@
 from typing import List
 from typing import NoReturn
 from typing import Optional
+from typing import Tuple
 
 from tnl.ast import Module
 from tnl.ast import Definition
@@ -27,8 +28,8 @@ from tnl.ast import Pattern
 from tnl.ast import Boolean
 from tnl.token import Token
 from tnl.token import TokenKind
-from tnl.map_impls import BUILT_IN_FUNCTIONS
-from tnl.map_impls import MAP_IMPL_REGISTRY
+from tnl.map_specs import BUILT_IN_FUNCTIONS
+from tnl.map_specs import MAP_SPECS
 
 
 TRANSFORM = 'transform'
@@ -50,6 +51,32 @@ KEYWORDS = {
 
 RESERVED_NAMES = KEYWORDS | BUILT_IN_FUNCTIONS
 
+# Token kinds the per-token paths compare with. Before python 3.12, getting
+# a member from its enum class (`TokenKind.NAME`) costs about as much as a
+# function call, and hashing one (for a set) is a python level call.
+NAME_KIND = TokenKind.NAME
+STRING_KIND = TokenKind.STRING
+NUMBER_KIND = TokenKind.NUMBER
+PATTERN_KIND = TokenKind.PATTERN
+TRUE_KIND = TokenKind.TRUE
+FALSE_KIND = TokenKind.FALSE
+LBRACE_KIND = TokenKind.LBRACE
+RBRACE_KIND = TokenKind.RBRACE
+RBRACKET_KIND = TokenKind.RBRACKET
+ARROW_KIND = TokenKind.ARROW
+PIPE_KIND = TokenKind.PIPE
+NEWLINE_KIND = TokenKind.NEWLINE
+
+RVALUE_START_KINDS = (
+    NAME_KIND,
+    STRING_KIND,
+    NUMBER_KIND,
+    PATTERN_KIND,
+    TRUE_KIND,
+    FALSE_KIND,
+    LBRACE_KIND,
+)
+
 
 class Parser:
     def __init__(self, tokens: List[Token], filename: str) -> None:
@@ -84,9 +111,9 @@ class Parser:
 
     def eat(self) -> None:
         self.token_index += 1
-        if self.token_index < len(self.tokens):
+        try:
             self.cur_token = self.tokens[self.token_index]
-        else:
+        except IndexError:
             self.error('Unexpected end of file.')
 
     @property
@@ -98,18 +125,20 @@ class Parser:
         else:
             self.error('Unexpected end of file')
 
+    # `kinds` are searched as a tuple: hashing a TokenKind (for a set) is
+    # a python level call, and there are only ever a few kinds
     def eat_expecting(self, *kinds: TokenKind) -> None:
         self.eat()
-        if self.cur_token.kind not in {*kinds}:
+        if self.cur_token.kind not in kinds:
             self.error_expecting(*kinds)
 
     def expect_and_eat(self, *kinds: TokenKind) -> None:
-        if self.cur_token.kind not in {*kinds}:
+        if self.cur_token.kind not in kinds:
             self.error_expecting(*kinds)
         self.eat()
 
     def expect(self, *kinds: TokenKind) -> None:
-        if self.cur_token.kind not in {*kinds}:
+        if self.cur_token.kind not in kinds:
             self.error_expecting(*kinds)
 
     def eat_newlines_expecting_at_least_one(self) -> None:
@@ -118,7 +147,7 @@ class Parser:
             self.eat()
 
     def eat_any_newlines(self) -> None:
-        while self.cur_token.kind == TokenKind.NEWLINE:
+        while self.cur_token.kind is NEWLINE_KIND:
             self.eat()
 
     @staticmethod
@@ -211,7 +240,7 @@ class Parser:
         self.expect_and_eat(TokenKind.LBRACKET)
         self.eat_any_newlines()
         header_rules: List[HeaderRule] = []
-        while self.cur_token.kind != TokenKind.RBRACKET:
+        while self.cur_token.kind is not RBRACKET_KIND:
             header_rule = self.parse_header_rule()
             header_rules.append(header_rule)
         self.eat_any_newlines()
@@ -222,18 +251,19 @@ class Parser:
     def parse_header_rule(self) -> HeaderRule:
         # we check for 'headers' specifically in parse_rule_block
         header = self.parse_header()
-        self.expect_and_eat(TokenKind.ARROW)
+        self.expect_and_eat(ARROW_KIND)
         pipeline = self.parse_execution()
         self.eat_newlines_expecting_at_least_one()
         return HeaderRule(header, pipeline)
 
     def parse_header(self) -> Header:
         header: Header
-        if self.cur_token.kind == TokenKind.STRING:
+        kind = self.cur_token.kind
+        if kind is STRING_KIND:
             header = self.parse_string()
-        elif self.cur_token.kind == TokenKind.NAME:
+        elif kind is NAME_KIND:
             header = self.parse_name()
-        elif self.cur_token.kind == TokenKind.PATTERN:
+        elif kind is PATTERN_KIND:
             header = self.parse_pattern()
         else:
             self.error_expecting(
@@ -250,7 +280,7 @@ class Parser:
         self.expect_and_eat(TokenKind.LBRACKET)
         self.eat_any_newlines()
         value_rules: List[ValueRule] = []
-        while self.cur_token.kind != TokenKind.RBRACKET:
+        while self.cur_token.kind is not RBRACKET_KIND:
             value_rule = self.parse_value_rule()
             value_rules.append(value_rule)
         self.eat_any_newlines()
@@ -259,8 +289,8 @@ class Parser:
         return ValueBlock(value_rules)
 
     def parse_value_rule(self) -> ValueRule:
-        rvalue = self.parse_rvalue()
-        self.expect_and_eat(TokenKind.ARROW)
+        rvalue, = self.parse_rvalues(1)
+        self.expect_and_eat(ARROW_KIND)
         pipeline = self.parse_execution()
         self.eat_any_newlines()
         return ValueRule(rvalue, pipeline)
@@ -273,16 +303,27 @@ class Parser:
         return Pipeline(operations)
 
     def parse_single_line_pipeline(self) -> List[Operation]:
-        if self.cur_token.kind == TokenKind.PIPE:
+        if self.cur_token.kind is PIPE_KIND:
             self.eat()
         operations: List[Operation] = []
-        operation = self.parse_operation()
-        operations.append(operation)
-        while self.cur_token.kind == TokenKind.PIPE:
-            self.eat()
-            operation = self.parse_operation()
+        while True:
+            # a known map is parsed here rather than via `parse_operation`
+            # and `parse_map`, which have the errors for the other cases
+            token = self.cur_token
+            map_spec = None
+            if token.kind is NAME_KIND:
+                map_spec = MAP_SPECS.get(self.assume_lexeme(token.lexeme))
+            operation: Operation
+            if map_spec is not None:
+                self.eat()
+                args = self.parse_rvalues(map_spec.num_args, map_spec.variadic)
+                operation = Map(Name(map_spec.name), args)
+            else:
+                operation = self.parse_operation()
             operations.append(operation)
-        return operations
+            if self.cur_token.kind is not PIPE_KIND:
+                return operations
+            self.eat()
 
     def parse_multi_line_pipeline(self) -> List[Operation]:
         self.expect_and_eat(TokenKind.LBRACKET)
@@ -297,7 +338,7 @@ class Parser:
 
     def parse_operation(self) -> Operation:
         operation: Operation
-        if self.cur_token.kind == TokenKind.NAME:
+        if self.cur_token.kind is NAME_KIND:
             lexeme = self.assume_lexeme(self.cur_token.lexeme)
             if lexeme == IF:
                 operation = self.parse_conditional()
@@ -313,34 +354,77 @@ class Parser:
 
     def parse_map(self) -> Map:
         name = self.parse_name()
-        if name.data not in MAP_IMPL_REGISTRY:
+        if name.data not in MAP_SPECS:
             self.error(
                 f'Unrecognized map \'{name.data}\'.',
                 is_syntax_error=False,
             )
-        map_impl = MAP_IMPL_REGISTRY[name.data]
-        args_list: List[RValue] = []
-        for _ in range(map_impl.num_args):
-            arg = self.parse_rvalue()
-            args_list.append(arg)
-        return Map(name, tuple(args_list))
+        map_spec = MAP_SPECS[name.data]
+        args = self.parse_rvalues(map_spec.num_args, map_spec.variadic)
+        return Map(name, args)
+
+    def parse_rvalues(
+        self,
+        num_rvalues: int,
+        variadic: bool = False,
+    ) -> Tuple[RValue, ...]:
+        # `num_rvalues` rvalues, then (if `variadic`) as many as follow.
+        # Strings, numbers and `['col']` selectors are parsed in this loop,
+        # which walks the tokens itself instead of calling a method per
+        # token (the tokens end with EOF, so looking ahead stays in them);
+        # anything else goes through `parse_rvalue`.
+        tokens = self.tokens
+        index = self.token_index
+        token = self.cur_token
+        rvalues: List[RValue] = []
+        while len(rvalues) < num_rvalues or (
+            variadic and token.kind in RVALUE_START_KINDS
+        ):
+            kind = token.kind
+            rvalue: RValue
+            if kind is STRING_KIND:
+                rvalue = String(self.assume_lexeme(token.lexeme))
+            elif kind is NUMBER_KIND:
+                rvalue = Number(int(self.assume_lexeme(token.lexeme)))
+            elif (
+                kind is LBRACE_KIND and
+                tokens[index + 1].kind is STRING_KIND and
+                tokens[index + 2].kind is RBRACE_KIND
+            ):
+                lexeme = self.assume_lexeme(tokens[index + 1].lexeme)
+                rvalue = ColumnSelector(String(lexeme))
+                index += 2
+            else:
+                self.token_index = index
+                self.cur_token = token
+                rvalues.append(self.parse_rvalue())
+                index = self.token_index
+                token = self.cur_token
+                continue
+            rvalues.append(rvalue)
+            index += 1
+            token = tokens[index]
+        self.token_index = index
+        self.cur_token = token
+        return tuple(rvalues)
 
     def parse_rvalue(self) -> RValue:
         rvalue: RValue
-        if self.cur_token.kind == TokenKind.NAME:
-            rvalue = self.parse_name()
-        elif self.cur_token.kind == TokenKind.STRING:
+        kind = self.cur_token.kind
+        if kind is STRING_KIND:
             rvalue = self.parse_string()
-        elif self.cur_token.kind == TokenKind.NUMBER:
+        elif kind is LBRACE_KIND:
+            rvalue = self.parse_column_selector()
+        elif kind is NUMBER_KIND:
             rvalue = self.parse_number()
-        elif self.cur_token.kind == TokenKind.PATTERN:
+        elif kind is NAME_KIND:
+            rvalue = self.parse_name()
+        elif kind is PATTERN_KIND:
             rvalue = self.parse_pattern()
-        elif self.cur_token.kind == TokenKind.TRUE:
+        elif kind is TRUE_KIND:
             rvalue = self.parse_true()
-        elif self.cur_token.kind == TokenKind.FALSE:
+        elif kind is FALSE_KIND:
             rvalue = self.parse_false()
-        elif self.cur_token.kind == TokenKind.LBRACE:
-            rvalue = self.parse_column_selector()
         else:
             self.error_expecting(
                 TokenKind.NAME,
@@ -369,28 +453,32 @@ class Parser:
         return expr
 
     def parse_string(self) -> String:
-        self.expect(TokenKind.STRING)
-        lexeme = self.assume_lexeme(self.cur_token.lexeme)
+        token = self.cur_token
+        if token.kind is not STRING_KIND:
+            self.error_expecting(STRING_KIND)
         self.eat()
-        return String(lexeme)
+        return String(self.assume_lexeme(token.lexeme))
 
     def parse_pattern(self) -> Pattern:
-        self.expect(TokenKind.PATTERN)
-        lexeme = self.assume_lexeme(self.cur_token.lexeme)
+        token = self.cur_token
+        if token.kind is not PATTERN_KIND:
+            self.error_expecting(PATTERN_KIND)
         self.eat()
-        return Pattern(lexeme)
+        return Pattern(self.assume_lexeme(token.lexeme))
 
     def parse_name(self) -> Name:
-        self.expect(TokenKind.NAME)
-        lexeme = self.assume_lexeme(self.cur_token.lexeme)
+        token = self.cur_token
+        if token.kind is not NAME_KIND:
+            self.error_expecting(NAME_KIND)
         self.eat()
-        return Name(lexeme)
+        return Name(self.assume_lexeme(token.lexeme))
 
     def parse_number(self) -> Number:
-        self.expect(TokenKind.NUMBER)
-        lexeme = self.assume_lexeme(self.cur_token.lexeme)
+        token = self.cur_token
+        if token.kind is not NUMBER_KIND:
+            self.error_expecting(NUMBER_KIND)
         self.eat()
-        data = int(lexeme)
+        data = int(self.assume_lexeme(token.lexeme))
         return Number(data)
 
     def parse_true(self) -> Boolean:
@@ -404,7 +492,7 @@ class Parser:
         return Boolean(False)
 
     def parse_column_selector(self) -> ColumnSelector:
-        self.expect_and_eat(TokenKind.LBRACE)
+        self.expect_and_eat(LBRACE_KIND)
         header = self.parse_header()
-        self.expect_and_eat(TokenKind.RBRACE)
+        self.expect_and_eat(RBRACE_KIND)
         return ColumnSelector(header)
@@ -0,0 +1,714 @@
+import re
+from functools import lru_cache
+from itertools import groupby
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import Type
+from typing import Union
+
+import pandas as pd  # type: ignore
+from pandas.api.types import infer_dtype  # type: ignore
+
+from tnl.ast import Module
+from tnl.ast import HeaderBlock
+from tnl.ast import HeaderRule
+from tnl.ast import ValueRule
+from tnl.ast import Pipeline
+from tnl.ast import Map
+from tnl.ast import ColumnSelector
+from tnl.ast import RValue
+from tnl.ast import String
+from tnl.ast import Number
+from tnl.ast import Pattern
+from tnl.ast import Boolean
+from tnl.ast_visitor import ASTVisitor
+from tnl.constant import Constant
+from tnl.map_impls import _map_elements
+from tnl.map_impls import MapImpl
+from tnl.map_impls import MultiReplaceImpl
+from tnl.map_impls import MAP_VALUES_IMPL_REGISTRY
+from tnl.map_impls import MAP_STRING_IMPL_REGISTRY
+from tnl.map_specs import MAP_SPECS
+
+
+# A plan is the AST lowered into a flat list of steps. Everything that
+# does not depend on the data (map lookups, literal unwrapping, pattern
+# compilation) is resolved once here, and each pipeline is compiled into
+# a python function (see `PipelineCompiler`), so executing a plan is just
+# a loop over the steps calling those functions.
+
+LiteralValue = Union[str, int, bool]
+
+
+def compile_plan(ast: Module, memo_size: Optional[int] = None) -> 'Plan':
+    # With a `memo_size`, string maps remember their results for that many
+    # values, evicting the least recently used ones first (see
+    # `FusedStringOp` and `Plan.memo_stats`).
+    compiler = PlanCompiler(memo_size)
+    compiler.visit(ast)
+    return Plan(compiler.steps)
+
+
+def load_plan(ast: Module) -> 'Plan':
+    # The plan is cached on the module, so a program applied to many
+    # frames is compiled once. The AST must not change after this (the
+    # optimizer runs before).
+    if ast.plan is None:
+        ast.plan = compile_plan(ast)
+    plan: Plan = ast.plan
+    return plan
+
+
+class Selector:
+    def __init__(
+        self,
+        column: Optional[str] = None,
+        pattern: Optional[re.Pattern[str]] = None,
+    ) -> None:
+        self.column = column
+        self.pattern = pattern
+
+    def select(self, columns: List[str]) -> List[str]:
+        if self.pattern is not None:
+            cp = self.pattern
+            return [col for col in columns if cp.match(col)]
+        assert self.column is not None
+        if self.column in columns:
+            return [self.column]
+        return []
+
+
+class ColumnRef:
+    def __init__(self, column: str) -> None:
+        self.column = column
+
+
+MapArg = Union[LiteralValue, ColumnRef]
+
+
+class LiteralOp:
+    def __init__(self, value: LiteralValue) -> None:
+        self.value = value
+
+
+class ColumnOp:
+    def __init__(self, column: str) -> None:
+        self.column = column
+
+
+class MapOp:
+    def __init__(
+        self,
+        name: str,
+        impl: Type[MapImpl],
+        args: Tuple[MapArg, ...],
+        string_fn: Optional[Callable[..., Any]] = None,
+    ) -> None:
+        self.name = name
+        self.impl = impl
+        self.args = args
+        self.row_local = MAP_SPECS[name].row_local
+        self.keeps_missing = MAP_SPECS[name].keeps_missing
+        self.has_column_args = any(isinstance(a, ColumnRef) for a in args)
+        # set for maps that have a `map_string` implementation (in values,
+        # only without column args), which lets them transform a string
+        # Constant without expanding it
+        self.string_fn = string_fn if not self.has_column_args else None
+
+
+class FusedStringOp:
+    # A run of consecutive string maps executed as one per-element
+    # function, so the column is traversed once instead of once per map.
+    # When memoized, the function caches its results by input value, which
+    # helps columns that repeat values. A memoized map that gives missing
+    # values a value (`format`) is one on its own, which is applied through
+    # its impl's `map_values_with` and caches only strings.
+    def __init__(
+        self,
+        ops: List[MapOp],
+        memo_size: Optional[int] = None,
+    ) -> None:
+        self.ops = ops
+        self.keeps_missing = all(op.keeps_missing for op in ops)
+        self.map_string = self.compose(ops)
+        self.memo: Optional[Any] = None
+        if memo_size is not None:
+            memoize = lru_cache(maxsize=memo_size, typed=True)
+            self.memo = memoize(self.map_string)
+            if self.keeps_missing:
+                self.map_string = self.memo
+            else:
+                self.map_string = self.memoize_strings(
+                    self.memo,
+                    self.map_string,
+                )
+
+    @staticmethod
+    def memoize_strings(
+        memo: Callable[[Any], str],
+        map_string: Callable[[Any], str],
+    ) -> Callable[[Any], str]:
+        # missing values (NaN isn't equal to itself) and other non strings
+        # go to the function uncached
+        def map_value(s: Any) -> str:
+            if isinstance(s, str):
+                return memo(s)
+            return map_string(s)
+        return map_value
+
+    @staticmethod
+    def compose(ops: List[MapOp]) -> Callable[[str], str]:
+        # Generates straight-line code (`s = _f0(s, _a0_0)` ...) so each
+        # element costs one call per map, without looping over the maps
+        # and unpacking their arguments for every row.
+        namespace: Dict[str, Any] = {}
+        lines = ['def map_string(s):']
+        for i, op in enumerate(ops):
+            namespace[f'_f{i}'] = op.string_fn
+            arg_names = []
+            for j, arg in enumerate(op.args):
+                namespace[f'_a{i}_{j}'] = arg
+                arg_names.append(f'_a{i}_{j}')
+            call_args = ''.join(f', {arg_name}' for arg_name in arg_names)
+            lines.append(f'    s = _f{i}(s{call_args})')
+        lines.append('    return s')
+        exec('\n'.join(lines), namespace)
+        map_string: Callable[[str], str] = namespace['map_string']
+        return map_string
+
+
+def holds_python_strings(s: pd.Series) -> bool:
+    # Whether a column can be given to the per-element function of a
+    # FusedStringOp: its values are python strings (or missing). Arrow
+    # backed `.str` methods are compiled kernels already, and any other
+    # column must get the unfused maps' results (or errors).
+    dtype = s.dtype
+    if isinstance(dtype, pd.StringDtype):
+        return bool(dtype.storage == 'python')
+    if dtype != object:
+        return False
+    return infer_dtype(s, skipna=True) in ('string', 'empty')
+
+
+Op = Union[LiteralOp, ColumnOp, MapOp, FusedStringOp]
+
+# pipelines compiled by `PipelineCompiler`: a header pipeline maps a
+# header, a values pipeline maps a column (given the frame, for column
+# selectors, and the row offset, see `tnl.vm.transform`)
+StringPipeline = Callable[[str], str]
+ValuesPipeline = Callable[[pd.Series, pd.DataFrame, int], Any]
+
+
+class HeaderRuleStep:
+    def __init__(
+        self,
+        selector: Selector,
+        ops: List[Op],
+        pipeline: StringPipeline,
+    ) -> None:
+        self.selector = selector
+        self.ops = ops
+        self.pipeline = pipeline
+
+
+class HeaderStep:
+    def __init__(self, rules: List[HeaderRuleStep]) -> None:
+        self.rules = rules
+
+
+class ValueStep:
+    def __init__(
+        self,
+        selector: Selector,
+        ops: List[Op],
+        pipeline: ValuesPipeline,
+    ) -> None:
+        self.selector = selector
+        self.ops = ops
+        self.pipeline = pipeline
+        # columns the pipeline reads besides the ones it is applied to
+        self.column_reads = {
+            column for op in ops for column in _op_column_reads(op)
+        }
+        # whether the result for a row only depends on the value in that
+        # row, so the pipeline gives the same result run on distinct values
+        self.elementwise = bool(ops) and all(map(_is_elementwise, ops))
+
+
+Step = Union[HeaderStep, ValueStep]
+
+
+class MemoStats:
+    def __init__(self, hits: int, misses: int, size: int) -> None:
+        self.hits = hits
+        self.misses = misses
+        self.size = size
+
+    def __str__(self) -> str:
+        return (
+            f'memo: {self.hits} hits, {self.misses} misses, '
+            f'{self.size} values cached'
+        )
+
+
+class Plan:
+    def __init__(self, steps: List[Step]) -> None:
+        self.steps = steps
+
+    def memo_stats(self) -> MemoStats:
+        # totals over the memoized string maps (see `compile_plan`)
+        stats = MemoStats(0, 0, 0)
+        for step in self.steps:
+            if not isinstance(step, ValueStep):
+                continue
+            for op in step.ops:
+                if isinstance(op, FusedStringOp) and op.memo is not None:
+                    info = op.memo.cache_info()
+                    stats.hits += info.hits
+                    stats.misses += info.misses
+                    stats.size += info.currsize
+        return stats
+
+
+def _op_column_reads(op: Op) -> List[str]:
+    if isinstance(op, ColumnOp):
+        return [op.column]
+    if isinstance(op, MapOp):
+        return [arg.column for arg in op.args if isinstance(arg, ColumnRef)]
+    return []
+
+
+def _is_elementwise(op: Op) -> bool:
+    if isinstance(op, FusedStringOp):
+        return True
+    if isinstance(op, MapOp):
+        return op.row_local and not op.has_column_args
+    return False
+
+
+def _is_memoizable_map(op: Op) -> bool:
+    # a per-element string map that isn't fused, see `FusedStringOp`
+    return (
+        isinstance(op, MapOp) and
+        op.string_fn is not None and
+        not op.keeps_missing and
+        hasattr(op.impl, 'map_values_with')
+    )
+
+
+def _is_string_map(op: Op) -> bool:
+    # fused string maps skip missing values, so maps that give them a
+    # value (`format`, or `concat` of literals) aren't fused
+    return (
+        isinstance(op, MapOp) and
+        op.string_fn is not None and
+        op.keeps_missing
+    )
+
+
+# Below about this many patterns, a `str.replace` per pattern is faster
+# than one regex pass: an alternation of literals starting with different
+# characters makes `re` try every position of the string.
+MIN_MERGED_REPLACES = 16
+
+
+def _replace_pair(op: Op) -> Optional[Tuple[str, str]]:
+    # the (from, to) strings of a literal `replace` map
+    if not isinstance(op, MapOp) or op.name != 'replace':
+        return None
+    if op.impl is MultiReplaceImpl:
+        return None
+    if not all(isinstance(arg, str) for arg in op.args):
+        return None
+    from_str, to_str = op.args
+    assert isinstance(from_str, str) and isinstance(to_str, str)
+    return from_str, to_str
+
+
+def _replaces_interact(
+    earlier: Tuple[str, str],
+    later: Tuple[str, str],
+) -> bool:
+    # Whether doing `later` after `earlier` may differ from doing both in
+    # one pass over the original string. They don't interact when their
+    # patterns can never overlap in a string, and `later` can never match
+    # text that `earlier` wrote or joined together by deleting.
+    from_str, to_str = earlier
+    later_from_str = later[0]
+    if not from_str or not later_from_str:
+        return True
+    if set(to_str) & set(later_from_str):
+        return True
+    if not to_str and len(later_from_str) > 1:
+        return True
+    if from_str in later_from_str or later_from_str in from_str:
+        return True
+    return any(
+        a.endswith(b[:i])
+        for a, b in [(from_str, later_from_str), (later_from_str, from_str)]
+        for i in range(1, min(len(a), len(b)))
+    )
+
+
+class PlanCompiler(ASTVisitor):
+    def __init__(self, memo_size: Optional[int] = None) -> None:
+        self.steps: List[Step] = []
+        self.memo_size = memo_size
+        self.pipeline_compiler = PipelineCompiler()
+
+    def visit_HeaderBlock(self, node: HeaderBlock) -> None:
+        # all rules of a block are applied as one relabeling of the columns
+        rules = [self.compile_header_rule(rule) for rule in node.header_rules]
+        self.steps.append(HeaderStep(rules))
+
+    def compile_header_rule(self, node: HeaderRule) -> HeaderRuleStep:
+        # TODO handle name later (look up var in symbol table
+        if isinstance(node.header, String):
+            selector = Selector(column=node.header.data)
+        elif isinstance(node.header, Pattern):
+            selector = Selector(pattern=node.header.compile())
+        else:
+            assert 0, f'{type(node)} not supported yet'
+        ops = self.compile_pipeline(node.pipeline, values=False)
+        pipeline = self.pipeline_compiler.compile_string_pipeline(ops)
+        return HeaderRuleStep(selector, ops, pipeline)
+
+    def visit_ValueRule(self, node: ValueRule) -> None:
+        # TODO handle name later (look up in symbol table
+        if isinstance(node.rvalue, ColumnSelector):
+            if isinstance(node.rvalue.header, String):
+                selector = Selector(column=node.rvalue.header.data)
+            elif isinstance(node.rvalue.header, Pattern):
+                selector = Selector(pattern=node.rvalue.header.compile())
+            else:
+                assert 0, f'{type(node)} not supported yet in column selector'
+        else:
+            assert 0, f'{type(node)} not supported yet'
+        ops = self.compile_pipeline(node.pipeline, values=True)
+        pipeline = self.pipeline_compiler.compile_values_pipeline(ops)
+        self.steps.append(ValueStep(selector, ops, pipeline))
+
+    def compile_pipeline(self, node: Pipeline, values: bool) -> List[Op]:
+        ops: List[Op] = []
+        for operation in node.operations:
+            op: Op
+            if isinstance(operation, (String, Number, Boolean)):
+                op = LiteralOp(operation.data)
+            elif isinstance(operation, ColumnSelector) and values:
+                op = ColumnOp(self.compile_column_ref(operation).column)
+            elif isinstance(operation, Map):
+                op = self.compile_map(operation, values)
+            else:
+                # FIXME
+                assert 0, 'not implemented'
+            ops.append(op)
+        if values:
+            ops = self.merge_replaces(ops)
+            ops = self.fuse_string_ops(ops)
+        return ops
+
+    def merge_replaces(self, ops: List[Op]) -> List[Op]:
+        # Consecutive literal `replace` maps become one multi-pattern
+        # replace, split wherever a rewrite interacts with an earlier one
+        # of its group, so the result is the same as replacing in order.
+        merged_ops: List[Op] = []
+        group: List[MapOp] = []
+        pairs: List[Tuple[str, str]] = []
+        for op in [*ops, None]:
+            pair = _replace_pair(op) if op is not None else None
+            if pair is not None and not any(
+                _replaces_interact(earlier, pair) for earlier in pairs
+            ):
+                assert isinstance(op, MapOp)
+                group.append(op)
+                pairs.append(pair)
+                continue
+            if len(group) >= MIN_MERGED_REPLACES:
+                args = tuple(arg for replace in pairs for arg in replace)
+                merged_ops.append(MapOp(
+                    'replace',
+                    MultiReplaceImpl,
+                    args,
+                    MultiReplaceImpl.map_string,
+                ))
+            else:
+                merged_ops.extend(group)
+            group, pairs = [], []
+            if pair is not None:
+                assert isinstance(op, MapOp)
+                group.append(op)
+                pairs.append(pair)
+            elif op is not None:
+                merged_ops.append(op)
+        return merged_ops
+
+    def fuse_string_ops(self, ops: List[Op]) -> List[Op]:
+        # when memoizing, single string maps and `format` also run per
+        # element
+        min_fused = 1 if self.memo_size is not None else 2
+        fused_ops: List[Op] = []
+        for is_string_map, group in groupby(ops, key=_is_string_map):
+            group_ops = list(group)
+            if is_string_map and len(group_ops) >= min_fused:
+                map_ops = [op for op in group_ops if isinstance(op, MapOp)]
+                fused_ops.append(FusedStringOp(map_ops, self.memo_size))
+            elif self.memo_size is not None:
+                for op in group_ops:
+                    if isinstance(op, MapOp) and _is_memoizable_map(op):
+                        op = FusedStringOp([op], self.memo_size)
+                    fused_ops.append(op)
+            else:
+                fused_ops.extend(group_ops)
+        return fused_ops
+
+    def compile_map(self, node: Map, values: bool) -> MapOp:
+        name = node.name.data
+        if values:
+            impl = MAP_VALUES_IMPL_REGISTRY[name]
+        else:
+            impl = MAP_STRING_IMPL_REGISTRY[name]
+        string_fn: Optional[Callable[..., Any]] = None
+        if name in MAP_STRING_IMPL_REGISTRY:
+            string_impl = MAP_STRING_IMPL_REGISTRY[name]
+            string_fn = string_impl.map_string  # type: ignore
+        args: List[MapArg] = []
+        for arg in node.args:
+            args.append(self.compile_map_arg(arg, values))
+        return MapOp(name, impl, tuple(args), string_fn)
+
+    def compile_map_arg(self, node: RValue, values: bool) -> MapArg:
+        if isinstance(node, (String, Number, Boolean)):
+            return node.data
+        elif isinstance(node, ColumnSelector) and values:
+            return self.compile_column_ref(node)
+        else:
+            print(type(node))
+            assert 0, 'failure in type checker at some point'
+
+    @staticmethod
+    def compile_column_ref(node: ColumnSelector) -> ColumnRef:
+        header = node.header
+        assert isinstance(header, String)
+        return ColumnRef(header.data)
+
+
+# Support code for compiled values pipelines, which mirrors how values
+# flow through ops: a map with a `map_string` implementation transforms a
+# string Constant without expanding it, and any other map gets a Series.
+PIPELINE_HELPERS = '''\
+def _materialize(s: Any) -> pd.Series:
+    if isinstance(s, Constant):
+        return s.materialize()
+    return s
+
+
+def _map_string_values(s: Any, impl: Any, *args: Any) -> Any:
+    if isinstance(s, Constant):
+        if isinstance(s.value, str):
+            return Constant(impl.map_string(s.value, *args), s.index)
+        s = s.materialize()
+    return impl.map_values(s, *args)
+
+
+def _map_strings(s: Any, map_string: Any, map_values: Any) -> Any:
+    # a FusedStringOp: `map_string` per element, or the unfused maps
+    if isinstance(s, Constant):
+        if isinstance(s.value, str):
+            return Constant(map_string(s.value), s.index)
+        s = s.materialize()
+    if holds_python_strings(s):
+        return _map_elements(s, map_string)
+    return map_values(s)
+
+
+def _map_values_with(s: Any, map_string: Any, impl: Any, *args: Any) -> Any:
+    # a FusedStringOp that maps missing values: `map_string` via the impl
+    if isinstance(s, Constant):
+        if isinstance(s.value, str):
+            return Constant(map_string(s.value), s.index)
+        s = s.materialize()
+    return impl.map_values_with(s, map_string, *args)
+'''
+
+
+class PipelineSource:
+    # The statements of a compiled values pipeline, which transform `s`
+    # (with `data` and `row_offset` in scope), and what `s` is after them.
+    # When `is_constant` the result is `constant_value` in every row and
+    # doesn't need `s`; else `s` may be a Constant if `maybe_constant`.
+    def __init__(self) -> None:
+        self.lines: List[str] = []
+        self.is_constant = False
+        self.constant_value: Any = None
+        self.maybe_constant = False
+
+
+class PipelineCompiler:
+    # Compiles pipelines to python source: straight-line code calling the
+    # map implementations, with literal arguments inlined and what is
+    # known at compile time (string maps applied to literals) already
+    # applied. The source is run through `exec` to get a function per
+    # pipeline, or, when `standalone`, written into a generated module by
+    # `tnl/codegen.py` (which then also defines the map implementations).
+    def __init__(self, standalone: bool = False) -> None:
+        self.standalone = standalone
+        self.impls: Dict[str, Type[MapImpl]] = {}
+        # module level definitions the generated code relies on
+        self.definitions: List[str] = []
+        self.num_executed = 0
+        self.namespace: Dict[str, Any] = {
+            'Any': Any,
+            'Constant': Constant,
+            '_map_elements': _map_elements,
+            'holds_python_strings': holds_python_strings,
+            'pd': pd,
+        }
+        exec(PIPELINE_HELPERS, self.namespace)
+
+    def new_name(self, prefix: str) -> str:
+        return f'{prefix}_{len(self.definitions)}'
+
+    def define(self, source: str) -> None:
+        self.definitions.append(source)
+
+    def exec_definitions(self) -> None:
+        for source in self.definitions[self.num_executed:]:
+            exec(source, self.namespace)
+        self.num_executed = len(self.definitions)
+
+    def compile_string_pipeline(self, ops: List[Op]) -> StringPipeline:
+        name = self.gen_string_pipeline(ops)
+        self.exec_definitions()
+        pipeline: StringPipeline = self.namespace[name]
+        return pipeline
+
+    def compile_values_pipeline(self, ops: List[Op]) -> ValuesPipeline:
+        source = self.gen_values_pipeline(ops)
+        name = self.new_name('_values_pipeline')
+        lines = [f'def {name}(s: Any, data: Any, row_offset: int) -> Any:']
+        lines.extend(f'    {line}' for line in source.lines)
+        if source.is_constant:
+            value = source.constant_value
+            lines.append(f'    return Constant({value!r}, data.index)')
+        else:
+            lines.append('    return s')
+        self.define('\n'.join(lines))
+        self.exec_definitions()
+        pipeline: ValuesPipeline = self.namespace[name]
+        return pipeline
+
+    def impl_ref(self, op: MapOp) -> str:
+        impl_name = op.impl.__name__
+        self.impls[impl_name] = op.impl
+        self.namespace[impl_name] = op.impl
+        return impl_name
+
+    def gen_string_call(self, op: MapOp) -> str:
+        args = ''.join(f', {arg!r}' for arg in op.args)
+        return f'{self.impl_ref(op)}.map_string(s{args})'
+
+    def gen_string_pipeline(self, ops: List[Op]) -> str:
+        # defines a function applying a header pipeline, returns its name
+        name = self.new_name('_string_pipeline')
+        lines = [f'def {name}(s: str) -> str:']
+        for op in ops:
+            if isinstance(op, LiteralOp):
+                lines.append(f'    s = {op.value!r}')
+            elif isinstance(op, MapOp):
+                lines.append(f'    s = {self.gen_string_call(op)}')
+            else:
+                assert 0, f'{type(op)} not supported in headers'
+        lines.append('    return s')
+        self.define('\n'.join(lines))
+        return name
+
+    def gen_values_pipeline(self, ops: List[Op]) -> PipelineSource:
+        source = PipelineSource()
+        lines = source.lines
+        for op in ops:
+            if isinstance(op, LiteralOp):
+                source.is_constant = True
+                source.constant_value = op.value
+                continue
+            if isinstance(op, ColumnOp):
+                source.is_constant = False
+                source.maybe_constant = False
+                lines.append(f's = data[{op.column!r}]')
+                continue
+            if source.is_constant and isinstance(source.constant_value, str):
+                if isinstance(op, FusedStringOp):
+                    source.constant_value = op.map_string(source.constant_value)
+                    continue
+                if op.string_fn is not None:
+                    source.constant_value = op.string_fn(
+                        source.constant_value,
+                        *op.args,
+                    )
+                    continue
+            if source.is_constant:
+                value = source.constant_value
+                lines.append(f's = pd.Series({value!r}, index=data.index)')
+                source.is_constant = False
+            if isinstance(op, FusedStringOp):
+                lines.append(f's = {self.gen_fused_string_op(op)}')
+            elif source.maybe_constant and op.string_fn is not None:
+                lines.append(f's = {self.gen_string_map_values(op)}')
+            else:
+                if source.maybe_constant:
+                    lines.append('s = _materialize(s)')
+                lines.append(f's = {self.gen_map_values(op)}')
+            source.maybe_constant = True
+        return source
+
+    @staticmethod
+    def gen_map_arg(arg: MapArg) -> str:
+        if isinstance(arg, ColumnRef):
+            return f'data[{arg.column!r}]'
+        return repr(arg)
+
+    def gen_map_values(self, op: MapOp) -> str:
+        args = [self.gen_map_arg(arg) for arg in op.args]
+        if hasattr(op.impl, 'gen_map_values'):
+            expr: str = op.impl.gen_map_values('s', *args)
+            return expr
+        if not op.row_local:
+            args.append('row_offset=row_offset')
+        call_args = ''.join(f', {arg}' for arg in args)
+        return f'{self.impl_ref(op)}.map_values(s{call_args})'
+
+    def gen_string_map_values(self, op: MapOp) -> str:
+        # a string map on something that may be a Constant
+        call_args = ''.join(f', {arg!r}' for arg in op.args)
+        return f'_map_string_values(s, {self.impl_ref(op)}{call_args})'
+
+    def gen_fused_string_op(self, op: FusedStringOp) -> str:
+        name = self.new_name('_fused_string_map')
+        if self.standalone:
+            # the same function `FusedStringOp.compose` builds
+            lines = [f'def {name}(s: str) -> str:']
+            for map_op in op.ops:
+                lines.append(f'    s = {self.gen_string_call(map_op)}')
+            lines.append('    return s')
+            self.define('\n'.join(lines))
+        else:
+            self.namespace[name] = op.map_string
+        fallback_lines = [f'def {name}_values(s: Any) -> Any:']
+        if not op.keeps_missing:
+            map_op, = op.ops
+            impl_name = self.impl_ref(map_op)
+            call_args = ''.join(f', {arg!r}' for arg in map_op.args)
+            fallback_lines.append(
+                f'    return _map_values_with(s, {name}, {impl_name}'
+                f'{call_args})'
+            )
+            self.define('\n'.join(fallback_lines))
+            return f'{name}_values(s)'
+        for map_op in op.ops:
+            fallback_lines.append(f'    s = {self.gen_string_map_values(map_op)}')
+        fallback_lines.append('    return s')
+        self.define('\n'.join(fallback_lines))
+        return f'_map_strings(s, {name}, {name}_values)'
@@ -0,0 +1,118 @@
+import csv
+import io
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Set
+from typing import Tuple
+
+import pandas as pd  # type: ignore
+
+from tnl.header_copy import COMPRESSED_EXTENSIONS
+from tnl.header_copy import read_header
+from tnl.plan import HeaderStep
+from tnl.plan import Plan
+from tnl.stream import ChunkTransform
+from tnl.vm import VM
+
+
+# Most programs only look at a few columns of a wide file, but reading the
+# whole file with `read_csv` infers the type of every column and `to_csv`
+# formats every one back, which costs time in proportion to all columns
+# and changes values nobody asked to change (`007` becomes `7`, `1.50`
+# becomes `1.5`). With `--raw-columns`, only the columns value rules read
+# or write (resolved through header renames and pattern selectors) are
+# read with `read_csv` and transformed, and their new text is spliced into
+# the rows of the file, whose other fields are carried through as they are.
+#
+# This is an option rather than the default since the output differs from
+# what pandas writes, and `--chunk-size` streaming, which writes what
+# pandas writes, can't be combined with it.
+#
+# Files whose rows pandas would line up differently (blank-looking rows,
+# rows with a different number of fields than the header) or whose header
+# it would read differently (see `tnl.header_copy.read_header`) are read
+# by pandas as usual.
+
+def resolve_columns(plan: Plan, names: List[str]) -> Tuple[List[str], Set[int]]:
+    # The labels the columns named `names` in the file end up with, and
+    # the positions of the columns that value steps are applied to or read.
+    labels = list(names)
+    touched: Set[int] = set()
+    for step in plan.steps:
+        if isinstance(step, HeaderStep):
+            labels = VM.map_headers(step, labels)
+            continue
+        columns = step.column_reads.union(step.selector.select(labels))
+        touched.update(i for i, label in enumerate(labels) if label in columns)
+    return labels, touched
+
+
+def transform_csv(
+    transform_data: ChunkTransform,
+    data_file: str,
+    plan: Optional[Plan] = None,
+) -> str:
+    # `data_file` transformed, as `to_csv(index=False)` writes it. Given
+    # the `plan` of `transform_data`, untouched columns are carried through.
+    if plan is not None:
+        spliced = transform_touched_columns(transform_data, plan, data_file)
+        if spliced is not None:
+            return spliced
+    # TODO: don't necessarily assume csv in the future
+    data = pd.read_csv(data_file)
+    transformed_data = transform_data(data, 0)
+    csv_str: str = transformed_data.to_csv(index=False)
+    return csv_str
+
+
+def transform_touched_columns(
+    transform_data: ChunkTransform,
+    plan: Plan,
+    data_file: str,
+) -> Optional[str]:
+    # None when the file has to be read by pandas as usual
+    if data_file.lower().endswith(COMPRESSED_EXTENSIONS):
+        return None
+    with open(data_file, 'rb') as fp:
+        header = read_header(fp)
+    if header is None:
+        return None
+    names, _ = header
+    labels, touched = resolve_columns(plan, names)
+    positions = sorted(touched)
+
+    transformed_rows: Iterator[List[str]] = iter([])
+    if positions:
+        usecols = [names[i] for i in positions]
+        transformed_data = transform_data(
+            pd.read_csv(data_file, usecols=usecols),
+            0,
+        )
+        assert len(transformed_data.columns) == len(positions)
+        transformed_rows = csv.reader(
+            io.StringIO(transformed_data.to_csv(index=False, header=False))
+        )
+
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator='\n')
+    writer.writerow(labels)
+    with open(data_file, newline='', encoding='utf-8-sig') as fp:
+        rows = csv.reader(fp)
+        next(rows)
+        for row in rows:
+            if not row:
+                # `read_csv` skips blank lines
+                continue
+            if len(row) != len(names):
+                return None
+            if positions:
+                values = next(transformed_rows, None)
+                if values is None:
+                    return None
+                for i, value in zip(positions, values):
+                    row[i] = value
+            writer.writerow(row)
+    if next(transformed_rows, None) is not None:
+        return None
+    return out.getvalue()
@@ -1,3 +1,5 @@
+import csv
+import os
 import re
 
 from typing import List
@@ -5,12 +7,21 @@ from typing import Optional
 
 from tnl.ast import ASTNode
 from tnl.ast import Map
+from tnl.ast import Number
 from tnl.ast import Pattern
 from tnl.ast import String
 from tnl.ast_visitor import ASTVisitor
 from tnl.token import Position
 
 
+# Patterns made only of word characters, spaces, commas, dashes, anchors,
+# alternations and `.` (optionally with one `*`, `+` or `?` after it) are
+# always valid, so they aren't compiled just to check them. Compiling is
+# most of the analysis of a large program, and each pattern is compiled
+# once anyway when the program's plan is built.
+SIMPLE_PATTERN_RE = re.compile(r'(?:[\w ,|^$-]|\.[*+?]?)*')
+
+
 class SemanticError:
     def __init__(self, message: str, pos: Optional[Position] = None) -> None:
         self.message = message
@@ -29,6 +40,30 @@ def analyze(ast: ASTNode) -> List[SemanticError]:
     return errors
 
 
+def check_lookup(node: Map) -> List[SemanticError]:
+    # the arguments of a `lookup` map, and that its table is there with
+    # the columns it names
+    if len(node.args) > 4:
+        return [SemanticError(
+            f'lookup takes 3 or 4 arguments, but got {len(node.args)}'
+        )]
+    args = [arg.data for arg in node.args if isinstance(arg, String)]
+    if len(args) != len(node.args):
+        return [SemanticError('lookup takes only strings')]
+    path, key_column, value_column = args[:3]
+    if not os.path.isfile(path):
+        return [SemanticError(f'Can\'t find lookup table {path}')]
+    with open(path, newline='') as fp:
+        header = next(csv.reader(fp), [])
+    errors = []
+    for column in (key_column, value_column):
+        if column not in header:
+            errors.append(SemanticError(
+                f'Lookup table {path} has no column \'{column}\''
+            ))
+    return errors
+
+
 class SemanticAnalyzer(ASTVisitor):
     def __init__(self, ast: ASTNode) -> None:
         self.ast = ast
@@ -48,8 +83,18 @@ class SemanticAnalyzer(ASTVisitor):
             except ValueError as ve:
                 error = SemanticError(f'Invalid format string ({str(ve)})')
                 self.errors.append(error)
+        elif node.name.data == 'lookup':
+            self.errors.extend(check_lookup(node))
+        elif node.name.data == 'lookup_pairs':
+            if not all(isinstance(arg, (String, Number)) for arg in node.args):
+                error = SemanticError(
+                    'lookup_pairs takes only strings and numbers'
+                )
+                self.errors.append(error)
 
     def visit_Pattern(self, node: Pattern) -> None:
+        if SIMPLE_PATTERN_RE.fullmatch(node.data):
+            return
         try:
             node.compile()
         except re.error:
@@ -0,0 +1,83 @@
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import TextIO
+from typing import Tuple
+
+import numpy as np
+import pandas as pd  # type: ignore
+from pandas.api.types import infer_dtype  # type: ignore
+from pandas.api.types import is_bool_dtype
+from pandas.api.types import is_numeric_dtype
+
+
+# Streaming transforms a csv file a chunk of rows at a time, so memory is
+# bounded by the chunk size rather than the file size. The output has to
+# match transforming the whole file at once, and `read_csv` infers column
+# dtypes per chunk, so the file is first scanned to find the dtype each
+# column gets when the whole file is read (e.g. a column of integers with
+# a missing value in a later chunk is float everywhere).
+
+STRING_KINDS = {'string', 'mixed', 'mixed-integer', 'mixed-integer-float'}
+
+# called with a chunk and the position of its first row in the file, e.g.
+# `functools.partial(tnl.vm.transform, plan)`
+ChunkTransform = Callable[[pd.DataFrame, int], pd.DataFrame]
+
+
+def transform_csv_chunks(
+    transform_chunk: ChunkTransform,
+    data_file: str,
+    out: TextIO,
+    chunk_size: int,
+) -> None:
+    read_dtypes, cast_dtypes = infer_csv_dtypes(data_file, chunk_size)
+    row_offset = 0
+    reader = pd.read_csv(data_file, chunksize=chunk_size, dtype=read_dtypes)
+    with reader:
+        for chunk in reader:
+            if cast_dtypes:
+                chunk = chunk.astype(cast_dtypes)
+            transformed_chunk = transform_chunk(chunk, row_offset)
+            transformed_chunk.to_csv(
+                out,
+                header=row_offset == 0,
+                index=False,
+            )
+            row_offset += len(chunk)
+    # matches the newline `print` adds after the whole-file output
+    out.write('\n')
+
+
+def infer_csv_dtypes(
+    data_file: str,
+    chunk_size: int,
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    # Returns the dtypes to read columns with (columns that hold strings
+    # somewhere must be read as text everywhere, to keep e.g. '1.50') and
+    # the dtypes to cast the other columns to once a chunk is read.
+    dtypes: Dict[str, List[Any]] = {}
+    kinds: Dict[str, List[str]] = {}
+    with pd.read_csv(data_file, chunksize=chunk_size) as reader:
+        for chunk in reader:
+            for col in chunk.columns:
+                dtypes.setdefault(col, []).append(chunk[col].dtype)
+                kinds.setdefault(col, []).append(infer_dtype(chunk[col]))
+    read_dtypes: Dict[str, Any] = {}
+    cast_dtypes: Dict[str, Any] = {}
+    for col, col_dtypes in dtypes.items():
+        first = col_dtypes[0]
+        if all(dtype == first for dtype in col_dtypes):
+            continue
+        if any(kind in STRING_KINDS for kind in kinds[col]):
+            read_dtypes[col] = str
+        elif all(
+            is_numeric_dtype(dtype) and not is_bool_dtype(dtype)
+            for dtype in col_dtypes
+        ):
+            cast_dtypes[col] = np.result_type(*col_dtypes)
+        else:
+            # booleans mixed with missing values
+            cast_dtypes[col] = object
+    return read_dtypes, cast_dtypes
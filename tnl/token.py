@@ -1,5 +1,6 @@
 from enum import auto
 from enum import Enum
+from typing import NamedTuple
 from typing import Optional
 from typing import Tuple
 
@@ -33,6 +34,8 @@ class TokenKind(Enum):
 
 
 class Position:
+    __slots__ = ('filename', 'line', 'col')
+
     def __init__(self, filename: str, line: int, col: int) -> None:
         self.filename = filename
         self.line = line
@@ -50,16 +53,12 @@ class Position:
         return (self.line, self.col)
 
 
-class Token:
-    def __init__(
-        self,
-        kind: TokenKind,
-        lexeme: Optional[str],
-        loc: Tuple[int, int],
-    ) -> None:
-        self.kind = kind
-        self.lexeme = lexeme
-        self.loc = loc
+class Token(NamedTuple):
+    # A tuple, so the lexer's fast path can build one without a python
+    # level `__init__` call (see `Lexer.lex_fast`).
+    kind: TokenKind
+    lexeme: Optional[str]
+    loc: Tuple[int, int]
 
     def __str__(self) -> str:
         name_with_comma = f'{self.kind.name},'
@@ -1,206 +1,255 @@
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+from itertools import groupby
+from typing import Dict
 from typing import List
+from typing import Set
+from typing import Tuple
 from typing import Union
 
 import pandas as pd  # type: ignore
 
 from tnl.ast import Module
-from tnl.ast import Transform
-from tnl.ast import Test
-from tnl.ast import AliasBlock
-from tnl.ast import HeaderBlock
-from tnl.ast import ValueBlock
-from tnl.ast import AliasRule
-from tnl.ast import HeaderRule
-from tnl.ast import ValueRule
-from tnl.ast import Pipeline
-from tnl.ast import BinaryOp
-from tnl.ast import UnaryOp
-from tnl.ast import Conditional
-from tnl.ast import Map
-from tnl.ast import ColumnSelector
-from tnl.ast import Name
-from tnl.ast import String
-from tnl.ast import Number
-from tnl.ast import Pattern
-from tnl.ast import Boolean
-from tnl.ast_visitor import ASTVisitor
-from tnl.map_impls import MAP_VALUES_IMPL_REGISTRY
-from tnl.map_impls import MAP_STRING_IMPL_REGISTRY
-
-
-def transform(ast: Module, data: pd.DataFrame) -> pd.DataFrame:
-    vm = VM(data)
-    vm.execute(ast)
+from tnl.constant import Constant
+from tnl.plan import load_plan
+from tnl.plan import Plan
+from tnl.plan import HeaderRuleStep
+from tnl.plan import HeaderStep
+from tnl.plan import Step
+from tnl.plan import ValueStep
+
+
+# (column, series before, result) for each column a value step applies to
+ValueResults = List[Tuple[str, pd.Series, Union[pd.Series, Constant]]]
+
+# Elementwise pipelines on string columns with few distinct values run on
+# the distinct values only (dictionary encoding), when a sample of the
+# rows has at most this fraction of distinct values.
+DICTIONARY_MIN_ROWS = 10_000
+DICTIONARY_SAMPLE_SIZE = 1_000
+DICTIONARY_MAX_DISTINCT_RATIO = 0.5
+
+
+def transform(
+    program: Union[Module, Plan],
+    data: pd.DataFrame,
+    row_offset: int = 0,
+    workers: int = 1,
+) -> pd.DataFrame:
+    # `row_offset` is the position of the first row of `data` in the whole
+    # input, for callers that transform the input a slice at a time.
+    # With `workers` > 1 independent value rules run on a thread pool.
+    if isinstance(program, Module):
+        program = load_plan(program)
+    vm = VM(data, row_offset, workers)
+    vm.execute(program)
     return vm.data
 
 
-class VM(ASTVisitor):
-    def __init__(self, data: pd.DataFrame) -> None:
+def schedule_value_steps(
+    steps: List[ValueStep],
+    columns: List[str],
+) -> List[List[ValueStep]]:
+    # Groups consecutive value steps into levels. A step's level is past
+    # that of every earlier step writing a column it reads (the columns it
+    # is applied to count as reads) and of every earlier step reading a
+    # column it writes, so no step of a level reads or writes a column
+    # another step of the level writes, and they can run concurrently.
+    # A step applied to several columns that also reads one of them sees
+    # the columns it already wrote, so it runs on its own, in a level no
+    # other step is put in.
+    levels: List[List[ValueStep]] = []
+    writer_levels: Dict[str, int] = {}
+    reader_levels: Dict[str, int] = {}
+    alone_levels: Set[int] = set()
+    for step in steps:
+        writes = step.selector.select(columns)
+        reads = step.column_reads.union(writes)
+        level = 1 + max(
+            chain(
+                (writer_levels.get(col, -1) for col in reads),
+                (reader_levels.get(col, -1) for col in writes),
+            ),
+            default=-1,
+        )
+        runs_alone = len(writes) > 1 and not step.column_reads.isdisjoint(writes)
+        if runs_alone:
+            level = max(level, len(levels))
+            alone_levels.add(level)
+        while level in alone_levels and level < len(levels):
+            level += 1
+        if level == len(levels):
+            levels.append([])
+        levels[level].append(step)
+        for col in reads:
+            reader_levels[col] = max(reader_levels.get(col, -1), level)
+        for col in writes:
+            writer_levels[col] = level
+    return levels
+
+
+class VM:
+    def __init__(
+        self,
+        data: pd.DataFrame,
+        row_offset: int = 0,
+        workers: int = 1,
+    ) -> None:
         self.data = data
-
-    def execute(self, node: Module) -> None:
-        self.visit(node)
-
-    def visit_Module(self, node: Module) -> None:
-        for definition in node.definitions:
-            self.visit(definition)
-
-    def visit_Transform(self, node: Transform) -> None:
-        # TODO for now ignore the `name`
-        for rule_block in node.rule_blocks:
-            self.visit(rule_block)
-
-    def visit_Test(self, node: Test) -> None:
-        # TODO
-        pass
-
-    def visit_AliasBlock(self, node: AliasBlock) -> None:
-        # TODO
-        pass
-
-    def visit_HeaderBlock(self, node: HeaderBlock) -> None:
-        for header_rule in node.header_rules:
-            self.visit(header_rule)
-
-    def visit_ValueBlock(self, node: ValueBlock) -> None:
-        for value_rule in node.value_rules:
-            self.visit(value_rule)
-
-    def visit_AliasRule(self, node: AliasRule) -> None:
-        # TODO
-        pass
-
-    def visit_HeaderRule(self, node: HeaderRule) -> None:
-        # TODO handle name later (look up var in symbol table
-        strs_to_map: List[str] = []
-        if isinstance(node.header, String):
-            strs_to_map = [node.header.data]
-        elif isinstance(node.header, Pattern):
-            cp = node.header.compile()
-            for col in self.data.columns:
-                if cp.match(col):
-                    strs_to_map.append(col)
-        else:
-            assert 0, f'{type(node)} not supported yet'
-        for from_str in strs_to_map:
-            to_str = self.exec_string_pipeline(node.pipeline, from_str)
-            self.data = self.data.rename(columns={from_str: to_str})
-
-    def visit_ValueRule(self, node: ValueRule) -> None:
-        # TODO handle name later (look up in symbol table
-        cols_to_map: List[str] = []
-        if isinstance(node.rvalue, ColumnSelector):
-            if isinstance(node.rvalue.header, String):
-                if node.rvalue.header.data in self.data.columns:
-                    cols_to_map = [node.rvalue.header.data]
-            elif isinstance(node.rvalue.header, Pattern):
-                cp = node.rvalue.header.compile()
-                for col in self.data.columns:
-                    if cp.match(col):
-                        cols_to_map.append(col)
+        self.row_offset = row_offset
+        self.workers = workers
+
+    def execute(self, plan: Plan) -> None:
+        if self.workers <= 1:
+            for step in plan.steps:
+                if isinstance(step, HeaderStep):
+                    self.exec_header_step(step)
+                else:
+                    self.exec_value_step(step)
+            return
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for is_header_step, group in groupby(plan.steps, key=_is_header_step):
+                if is_header_step:
+                    for step in group:
+                        assert isinstance(step, HeaderStep)
+                        self.exec_header_step(step)
+                else:
+                    value_steps = [s for s in group if isinstance(s, ValueStep)]
+                    self.exec_value_steps_concurrently(value_steps, executor)
+
+    def exec_header_step(self, step: HeaderStep) -> None:
+        columns = list(self.data.columns)
+        labels = self.map_headers(step, columns)
+        if labels != columns:
+            self.data = self.data.set_axis(labels, axis=1)
+
+    @classmethod
+    def map_headers(cls, step: HeaderStep, columns: List[str]) -> List[str]:
+        # Rules are applied in order, and a rename relabels every column
+        # currently carrying `from_str` (like `DataFrame.rename` does), but
+        # the frame itself is only relabeled once by the caller. Columns
+        # are grouped by label so each rename only touches its own group.
+        labels = list(columns)
+        positions: Dict[str, List[int]] = {}
+        for i, label in enumerate(labels):
+            positions.setdefault(label, []).append(i)
+        for rule in step.rules:
+            strs_to_map: List[str]
+            if rule.selector.pattern is not None:
+                strs_to_map = rule.selector.select(labels)
             else:
-                assert 0, f'{type(node)} not supported yet in column selector'
-        else:
-            assert 0, f'{type(node)} not supported yet'
-
+                assert rule.selector.column is not None
+                strs_to_map = [rule.selector.column]
+            for from_str in dict.fromkeys(strs_to_map):
+                if from_str not in positions:
+                    continue
+                to_str = cls.exec_string_pipeline(rule, from_str)
+                if to_str == from_str:
+                    continue
+                moved = positions.pop(from_str)
+                for i in moved:
+                    labels[i] = to_str
+                positions.setdefault(to_str, []).extend(moved)
+        return labels
+
+    def exec_value_step(self, step: ValueStep) -> None:
         # TODO: we may want to provide a way for user to learn that
         #       their rule didn't apply to any header
-        for col in cols_to_map:
-            # TODO: consider copy perf later
-            series_before = self.data[col].copy()
-            series_after = self.exec_values_pipeline(
-                node.pipeline,
+        for col in step.selector.select(self.data.columns):
+            self.write_value_results(self.eval_value_column(step, col))
+
+    def exec_value_steps_concurrently(
+        self,
+        steps: List[ValueStep],
+        executor: ThreadPoolExecutor,
+    ) -> None:
+        columns = list(self.data.columns)
+        for level in schedule_value_steps(steps, columns):
+            if len(level) == 1:
+                self.exec_value_step(level[0])
+                continue
+            futures = [
+                executor.submit(self.eval_value_step, step)
+                for step in level
+            ]
+            # nothing is written back until every rule of the level ran
+            results = [future.result() for future in futures]
+            for step_results in results:
+                self.write_value_results(step_results)
+
+    def eval_value_step(self, step: ValueStep) -> ValueResults:
+        results: ValueResults = []
+        for col in step.selector.select(self.data.columns):
+            results.extend(self.eval_value_column(step, col))
+        return results
+
+    def eval_value_column(self, step: ValueStep, col: str) -> ValueResults:
+        # No defensive copy: maps never modify their inputs (see
+        # `MapImpl`), so a column is only written back when the
+        # pipeline produced something new for it.
+        series_before = self.data[col]
+        series_after: Union[pd.Series, Constant]
+        if step.elementwise and is_low_cardinality_string(series_before):
+            series_after = self.exec_values_pipeline_encoded(
+                step,
                 series_before,
             )
-            self.data[col] = series_after
-
-    def exec_string_pipeline(self, node: Pipeline, s: str) -> str:
-        for operation in node.operations:
-            if isinstance(operation, String):
-                s = operation.data
-            elif isinstance(operation, Map):
-                map_impl = MAP_STRING_IMPL_REGISTRY[operation.name.data]
-                s = map_impl.map_string(s, *operation.args)  # type: ignore
-            else:
-                # FIXME
-                assert 0, 'not implemented'
-        return s
-
-    def exec_values_pipeline(self, node: Pipeline, s: pd.Series) -> pd.Series:
-        for operation in node.operations:
-            if isinstance(operation, ColumnSelector):
-                # TODO consider copy perf later
-                header = operation.header
-                assert isinstance(header, String)
-                s = self.data[header.data].copy()
-            elif isinstance(operation, String):
-                s = pd.Series(operation.data for _ in range(len(self.data)))
-            elif isinstance(operation, Number):
-                s = pd.Series(operation.data for _ in range(len(self.data)))
-            elif isinstance(operation, Boolean):
-                s = pd.Series(operation.data for _ in range(len(self.data)))
-            elif isinstance(operation, Map):
-                map_impl = MAP_VALUES_IMPL_REGISTRY[operation.name.data]
-                map_args: List[Union[String, Number, pd.Series]] = []
-                for op_arg in operation.args:
-                    if isinstance(op_arg, String):
-                        map_args.append(op_arg)
-                    elif isinstance(op_arg, Number):
-                        map_args.append(op_arg)
-                    elif isinstance(op_arg, ColumnSelector):
-                        # TODO consider copy perf later
-                        header = op_arg.header
-                        assert isinstance(header, String)
-                        arg = self.data[header.data].copy()
-                        map_args.append(arg)
-                    else:
-                        print(type(op_arg))
-                        assert 0, 'failure in type checker at some point'
-                s = map_impl.map_values(s, *map_args)  # type: ignore
-            else:
-                # FIXME
-                assert 0, 'not implemented'
-        return s
-
-    def visit_Pipeline(self, node: Pipeline) -> None:
-        assert 0, 'Failed to capture Pipeline in VM.'
-
-    def visit_BinaryOp(self, node: BinaryOp) -> None:
-        # FIXME
-        pass
-
-    def visit_UnaryOp(self, node: UnaryOp) -> None:
-        # FIXME
-        pass
-
-    def visit_Conditional(self, node: Conditional) -> None:
-        # FIXME
-        pass
-
-    def visit_Map(self, node: Map) -> None:
-        # FIXME
-        pass
-
-    def visit_ColumnSelector(self, node: ColumnSelector) -> None:
-        # FIXME
-        pass
-
-    def visit_Name(self, node: Name) -> None:
-        # FIXME
-        pass
-
-    def visit_String(self, node: String) -> None:
-        # FIXME
-        pass
-
-    def visit_Number(self, node: Number) -> None:
-        # FIXME
-        pass
-
-    def visit_Pattern(self, node: Pattern) -> None:
-        # TODO
-        pass
-
-    def visit_Boolean(self, node: Boolean) -> None:
-        # TODO
-        pass
+        else:
+            series_after = self.exec_values_pipeline(step, series_before)
+        return [(col, series_before, series_after)]
+
+    def write_value_results(self, results: ValueResults) -> None:
+        for col, series_before, series_after in results:
+            if isinstance(series_after, Constant):
+                # let pandas broadcast the scalar into the column
+                self.data[col] = series_after.value
+            elif series_after is not series_before:
+                self.data[col] = series_after
+
+    @staticmethod
+    def exec_string_pipeline(rule: HeaderRuleStep, s: str) -> str:
+        return rule.pipeline(s)
+
+    def exec_values_pipeline(
+        self,
+        step: ValueStep,
+        s: pd.Series,
+    ) -> Union[pd.Series, Constant]:
+        result: Union[pd.Series, Constant]
+        result = step.pipeline(s, self.data, self.row_offset)
+        return result
+
+    def exec_values_pipeline_encoded(
+        self,
+        step: ValueStep,
+        s: pd.Series,
+    ) -> Union[pd.Series, Constant]:
+        # Runs the pipeline on the distinct values (missing values, if any,
+        # as one more) and expands the results back through the codes.
+        codes, uniques = pd.factorize(s)
+        distinct = pd.Series(uniques, dtype=s.dtype)
+        missing = codes == -1
+        if missing.any():
+            codes[missing] = len(distinct)
+            first_missing = s[missing].iloc[:1]
+            distinct = pd.concat([distinct, first_missing], ignore_index=True)
+        result = self.exec_values_pipeline(step, distinct)
+        if isinstance(result, Constant):
+            return Constant(result.value, s.index)
+        return result.take(codes).set_axis(s.index)
+
+
+def is_low_cardinality_string(s: pd.Series) -> bool:
+    # estimated from evenly spaced rows, which is cheap and good enough
+    # for columns like a country or a status
+    if len(s) < DICTIONARY_MIN_ROWS:
+        return False
+    if s.dtype != object and not isinstance(s.dtype, pd.StringDtype):
+        return False
+    sample = s.iloc[::len(s) // DICTIONARY_SAMPLE_SIZE]
+    distinct_ratio = sample.nunique(dropna=False) / len(sample)
+    return bool(distinct_ratio <= DICTIONARY_MAX_DISTINCT_RATIO)
+
+
+def _is_header_step(step: Step) -> bool:
+    return isinstance(step, HeaderStep)